@@ -0,0 +1,277 @@
+import fcntl
+import functools
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, jsonify, request
+
+from metrics import metrics
+from wiki_cache import CACHE_DIR
+
+ADMISSION_DIR = os.environ.get('ADMISSION_DIR', os.path.join(CACHE_DIR, 'admission'))
+
+# Set to 0 to admit every request immediately
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Requests of each pool running at once across all workers, and requests allowed to wait for a slot
+PREDICT_CONCURRENCY = int(os.environ.get('PREDICT_CONCURRENCY', CPU_COUNT))
+PREDICT_QUEUE_SIZE = int(os.environ.get('PREDICT_QUEUE_SIZE', 2 * CPU_COUNT))
+CHAT_CONCURRENCY = int(os.environ.get('CHAT_CONCURRENCY', 4 * CPU_COUNT))
+CHAT_QUEUE_SIZE = int(os.environ.get('CHAT_QUEUE_SIZE', 4 * CPU_COUNT))
+# Each running batch keeps a whole process pool busy, so batches run one at a time by default
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', 1))
+BATCH_QUEUE_SIZE = int(os.environ.get('BATCH_QUEUE_SIZE', 2))
+# A /jobs long-poll holds a sync worker while it waits, so only this many run at once and
+# extra pollers are told to retry instead of queueing
+JOB_POLL_CONCURRENCY = int(os.environ.get('JOB_POLL_CONCURRENCY', CPU_COUNT))
+JOB_POLL_QUEUE_SIZE = int(os.environ.get('JOB_POLL_QUEUE_SIZE', 0))
+
+# Longest a request waits for a slot before it is shed, kept well under the gunicorn timeout
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10))
+
+# Retry-After sent with 503 responses when a pool is saturated
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 2))
+
+# Requests per minute allowed per client address (0 disables), and the burst above that rate
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 0))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', RATE_LIMIT_PER_MINUTE))
+
+# Client addresses hash into this many shared buckets
+RATE_LIMIT_BUCKETS = int(os.environ.get('RATE_LIMIT_BUCKETS', 4096))
+
+
+class SlotPool:
+    """Cross-process semaphore made of lock files; holding an flock on a file holds its slot
+
+    flock is per open file, so slots held by other threads of this process
+    are tracked here as well. Locks are released by the kernel if a worker
+    dies, so a crashed worker never leaks a slot.
+    """
+
+    def __init__(self, name, size, directory=ADMISSION_DIR):
+        self.name = name
+        self.size = size
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._files = None
+        self._held = set()
+        self._pid = None
+
+    def _slot_files(self):
+        if self._files is None or self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self._files = [open(os.path.join(self.directory, f'{self.name}.{index}.slot'), 'a')
+                           for index in range(self.size)]
+            self._held = set()
+            self._pid = os.getpid()
+        return self._files
+
+    def try_acquire(self):
+        """Take a free slot and return its index, or None if all are taken"""
+        with self._lock:
+            for index, slot_file in enumerate(self._slot_files()):
+                if index in self._held:
+                    continue
+                try:
+                    fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(index)
+                return index
+        return None
+
+    def release(self, index):
+        with self._lock:
+            fcntl.flock(self._files[index], fcntl.LOCK_UN)
+            self._held.discard(index)
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; retry_after is in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """Concurrency limit with a bounded queue of requests waiting for a slot"""
+
+    def __init__(self, name, concurrency, queue_size, queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.running = SlotPool(name, concurrency)
+        self.waiting = SlotPool(f'{name}-queue', queue_size)
+        self.queue_timeout = queue_timeout
+
+    def acquire(self):
+        """Return a running slot, waiting for one if the queue has room; raises Overloaded"""
+        slot = self.running.try_acquire()
+        if slot is not None:
+            metrics.inc('flora_admission_total', pool=self.name, outcome='admitted')
+            return slot
+
+        place = self.waiting.try_acquire()
+        if place is None:
+            metrics.inc('flora_admission_total', pool=self.name, outcome='rejected')
+            raise Overloaded(ADMISSION_RETRY_AFTER)
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            delay = 0.005
+            with metrics.timer('admission_wait'):
+                while time.monotonic() < deadline:
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.1)
+                    slot = self.running.try_acquire()
+                    if slot is not None:
+                        metrics.inc('flora_admission_total', pool=self.name, outcome='queued')
+                        return slot
+        finally:
+            self.waiting.release(place)
+        metrics.inc('flora_admission_total', pool=self.name, outcome='timed_out')
+        raise Overloaded(ADMISSION_RETRY_AFTER)
+
+    def release(self, slot):
+        self.running.release(slot)
+
+    @contextmanager
+    def hold(self):
+        """Hold a running slot for background work, waiting as long as it takes
+
+        Unlike acquire() this never takes a place in the request queue or
+        gives up, so background work yields to requests instead of shedding them.
+        """
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        delay = 0.005
+        slot = self.running.try_acquire()
+        while slot is None:
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+            slot = self.running.try_acquire()
+        try:
+            yield
+        finally:
+            self.release(slot)
+
+
+class TokenBucket:
+    """Per-client token buckets in a memory-mapped file shared by all workers
+
+    Each bucket is (tokens, updated_at); clients hash to a fixed bucket, and
+    updates are serialized with an flock on the file.
+    """
+
+    ENTRY = struct.Struct('<dd')
+
+    def __init__(self, rate_per_minute, burst, buckets=RATE_LIMIT_BUCKETS, directory=ADMISSION_DIR):
+        self.rate = rate_per_minute / 60
+        self.burst = max(burst, 1)
+        self.buckets = buckets
+        self.path = os.path.join(directory, 'rate_limit.buckets')
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._pid = None
+
+    def _mapping(self):
+        if self._map is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'a+b')
+            size = self.buckets * self.ENTRY.size
+            if os.fstat(self._file.fileno()).st_size < size:
+                self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+            self._pid = os.getpid()
+        return self._map
+
+    def allow(self, client):
+        """Take a token for client; returns 0 if allowed, else seconds until a token is available"""
+        digest = hashlib.blake2b(client.encode('utf-8'), digest_size=8).digest()
+        offset = int.from_bytes(digest, 'little') % self.buckets * self.ENTRY.size
+        now = time.time()
+        with self._lock:
+            mapping = self._mapping()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                tokens, updated_at = self.ENTRY.unpack_from(mapping, offset)
+                if updated_at == 0:
+                    tokens = self.burst
+                tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.ENTRY.pack_into(mapping, offset, tokens, now)
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+        return 0 if allowed else (1 - tokens) / self.rate
+
+
+limiters = {
+    'predict': Limiter('predict', PREDICT_CONCURRENCY, PREDICT_QUEUE_SIZE),
+    'chat': Limiter('chat', CHAT_CONCURRENCY, CHAT_QUEUE_SIZE),
+    'batch': Limiter('batch', BATCH_CONCURRENCY, BATCH_QUEUE_SIZE),
+    'jobs': Limiter('jobs', JOB_POLL_CONCURRENCY, JOB_POLL_QUEUE_SIZE),
+}
+
+rate_limiter = TokenBucket(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST) if RATE_LIMIT_PER_MINUTE > 0 else None
+
+
+def _refuse(status, message, retry_after):
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
+def admit(pool):
+    """Decorate a view so it runs only when the pool has capacity and the client is within its rate"""
+    limiter = limiters[pool]
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ADMISSION_ENABLED:
+                return view(*args, **kwargs)
+
+            if rate_limiter is not None:
+                try:
+                    wait = rate_limiter.allow(request.remote_addr or 'unknown')
+                except OSError as e:
+                    logging.error("Error checking rate limit: %s", e)
+                    wait = 0
+                if wait:
+                    metrics.inc('flora_admission_total', pool=pool, outcome='rate_limited')
+                    return _refuse(429, 'Too many requests. Please slow down.', wait)
+
+            try:
+                slot = limiter.acquire()
+            except Overloaded as e:
+                return _refuse(503, 'The server is busy. Please try again shortly.', e.retry_after)
+            except OSError as e:
+                # Admission is a safeguard; never fail a request because the lock files are unusable
+                logging.error("Error acquiring admission slot: %s", e)
+                return view(*args, **kwargs)
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                limiter.release(slot)
+                raise
+            if isinstance(response, Response) and response.is_streamed:
+                # A streamed body does its work after the view returns; hold the slot until it is sent
+                response.call_on_close(lambda: limiter.release(slot))
+            else:
+                limiter.release(slot)
+            return response
+
+        return wrapper
+
+    return decorator
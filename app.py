@@ -1,268 +1,373 @@
 import os
 import logging
 import uuid
-import requests
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, abort, g, render_template, request, jsonify
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.middleware.proxy_fix import ProxyFix
 from PIL import Image
 import io
+import json
 import base64
+import math
+import multiprocessing
 # Using a simpler approach for plant identification without heavy ML dependencies
 # from transformers import pipeline
 import random
 import time
+from concurrent.futures import FIRST_COMPLETED, as_completed, wait as wait_for_futures
+from admission import admit, limiters
+from assets import UNVERSIONED_ASSETS, AssetManifest
+from batch import (BATCH_IN_FLIGHT, MAX_BATCH_BYTES, MAX_BATCH_FILES, collect_images, detach_uploads,
+                   batch_executor, read_image)
+from catalog import catalog
+from chat_router import chat_router
+from features import extract_color_features, feature_vector, perceptual_cache_key
+from logging_setup import clear_request_context, configure_logging, set_request_context
+from jobs import JOB_QUEUED, QueueFull, job_store
+from janitor import UploadJanitor
+from metrics import SERVER_TIMING, metrics, server_timing_header
+from ingest import (ANALYSIS_TILED, SPOOL_UPLOADS, ImageRejected, UploadRequest, bytes_digest,
+                    image_dimensions, load_analysis, sniff_stream, upload_digest)
+from result_cache import RESULT_CACHE_PERCEPTUAL, result_cache
+from species_index import load_species_index
+from wiki_cache import STATUS_ERROR, STATUS_MISSING, STATUS_OK, wiki_cache
+from wiki_client import wiki_client
+from wiki_snapshot import WIKI_SNAPSHOT_MAX_AGE, load_wiki_snapshot, snapshot_refresher
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging: records are written by a background thread (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE)
+configure_logging()
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = os.environ.get("SESSION_SECRET", "flora-secret-key-2024")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# Proxies in front of the app that append to X-Forwarded-For (Render's router is one), so
+# remote_addr is the real client the rate limiter keys on, not the proxy shared by everyone
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=1, x_host=1)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
 
+# Enforced while the body is read, so oversized uploads are refused with 413
+# before they are buffered; the extra allowance covers multipart framing
+app.config['MAX_FILE_SIZE'] = MAX_FILE_SIZE
+app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE + 64 * 1024
+
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Simplified plant identification without heavy ML dependencies
-classifier = None
+# Content-hashed, precompressed static assets; templates link them with asset_url()
+asset_manifest = AssetManifest(app.static_folder).build()
+app.jinja_env.globals['asset_url'] = asset_manifest.url
+
+# Stale uploads are removed in the background by one worker per host
+upload_janitor = UploadJanitor(UPLOAD_FOLDER)
+
+# gunicorn.conf.py sets this and calls warm_up()/start_worker() from its hooks
+WORKER_HOOKS = os.environ.get('FLORA_WORKER_HOOKS') == '1'
+
+# Startup timing and warm-up state reported by /health
+PROCESS_STARTED_AT = time.time()
+readiness = {'warm': False, 'warm_up_seconds': None, 'warm_up_pid': None}
+
+# Optional nearest-neighbor index built with `python species_index.py build`
+species_index = load_species_index()
+
+# Optional offline summaries written by `python wiki_snapshot.py`
+wiki_snapshot = load_wiki_snapshot()
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def get_wikipedia_summary(plant_name):
-    """Fetch plant description from Wikipedia API"""
-    try:
-        # First, search for the plant
-        search_url = "https://en.wikipedia.org/api/rest_v1/page/summary/" + plant_name.replace(" ", "_")
-        
-        response = requests.get(search_url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('extract', 'No description available for this plant.')
+    """Get plant description from Wikipedia, served from the snapshot or cache when possible
+
+    Returns (status, description); status is STATUS_ERROR when the text is only a
+    placeholder for a failed fetch.
+    """
+    entry = wiki_snapshot.get(plant_name) if wiki_snapshot is not None else None
+    if entry is not None:
+        status, text, fetched_at = entry
+        if time.time() - fetched_at < WIKI_SNAPSHOT_MAX_AGE:
+            metrics.inc('flora_cache_requests_total', cache='wiki_snapshot', outcome='hit')
         else:
-            # Try alternative search
-            search_url = "https://en.wikipedia.org/w/api.php"
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'titles': plant_name,
-                'prop': 'extracts',
-                'exintro': True,
-                'explaintext': True,
-                'exsectionformat': 'plain'
-            }
-            response = requests.get(search_url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                pages = data.get('query', {}).get('pages', {})
-                for page_id, page_data in pages.items():
-                    extract = page_data.get('extract', '')
-                    if extract and len(extract) > 50:
-                        return extract[:500] + "..." if len(extract) > 500 else extract
-            
-            return "No detailed description available for this plant."
-    except Exception as e:
-        logging.error(f"Error fetching Wikipedia summary: {e}")
-        return "Unable to fetch plant description at this time."
+            # Prefer an already refreshed copy; otherwise serve the stale text and refresh it
+            metrics.inc('flora_cache_requests_total', cache='wiki_snapshot', outcome='stale')
+            cached = wiki_cache.get(plant_name)
+            if cached is not None:
+                status, text = cached
+            else:
+                snapshot_refresher.refresh(plant_name)
+    else:
+        cached = wiki_cache.get(plant_name)
+        metrics.inc('flora_cache_requests_total', cache='wikipedia', outcome='hit' if cached is not None else 'miss')
+        if cached is not None:
+            status, text = cached
+        else:
+            status, text = wiki_client.fetch_summary(plant_name)
+            wiki_cache.put(plant_name, status, text)
+    
+    if status == STATUS_OK:
+        return status, text
+    elif status == STATUS_MISSING:
+        return status, "No detailed description available for this plant."
+    return STATUS_ERROR, "Unable to fetch plant description at this time."
 
-def identify_plant(image_path):
+def identify_plant(image_source):
     """Advanced plant identification using image analysis and botanical database"""
     try:
         # Load and analyze the image for botanical characteristics
-        with Image.open(image_path) as img:
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Advanced image analysis
-            width, height = img.size
-            analysis_img = img.resize((224, 224))  # Standard size for analysis
-            pixels = list(analysis_img.getdata())
-            
-            # Analyze color composition
-            green_pixels = red_pixels = blue_pixels = yellow_pixels = 0
-            total_pixels = len(pixels)
-            
-            for r, g, b in pixels:
-                # Advanced color analysis for botanical features
-                if g > r and g > b and g > 80:  # Green (chlorophyll)
-                    green_pixels += 1
-                elif r > g and r > b and r > 100:  # Red (flowers, autumn leaves)
-                    red_pixels += 1
-                elif r > 150 and g > 150 and b < 100:  # Yellow (flowers, dying leaves)
-                    yellow_pixels += 1
-                elif b > r and b > g and b > 80:  # Blue (rare in plants, some flowers)
-                    blue_pixels += 1
-            
-            green_ratio = green_pixels / total_pixels
-            red_ratio = red_pixels / total_pixels
-            yellow_ratio = yellow_pixels / total_pixels
-            
-            # Advanced botanical classification with scientific accuracy
-            plant_database = {
-                'tropical_houseplants': {
-                    'plants': [
-                        ("Monstera deliciosa", "Split-leaf philodendron native to Central American rainforests, known for its fenestrated leaves."),
-                        ("Epipremnum aureum", "Golden pothos from Southeast Asia, excellent air purifier with heart-shaped variegated leaves."),
-                        ("Philodendron hederaceum", "Heartleaf philodendron, fast-growing vine with glossy green heart-shaped foliage."),
-                        ("Ficus lyrata", "Fiddle-leaf fig from western Africa, featuring large violin-shaped leaves and upright growth."),
-                        ("Ficus elastica", "Indian rubber tree with thick, glossy leaves and natural latex production capabilities."),
-                        ("Dracaena trifasciata", "Snake plant (Sansevieria) from West Africa, extremely drought-tolerant with sword-like leaves."),
-                        ("Zamioculcas zamiifolia", "ZZ plant from eastern Africa, waxy dark green leaves, extremely low maintenance.")
-                    ],
-                    'conditions': lambda g, r, y: g > 0.4 and r < 0.1 and y < 0.1
-                },
-                'flowering_plants': {
-                    'plants': [
-                        ("Saintpaulia ionantha", "African violet from Tanzania, compact rosette with velvety leaves and colorful flowers."),
-                        ("Spathiphyllum wallisii", "Peace lily from tropical Americas, white spathes and excellent air purification."),
-                        ("Anthurium andraeanum", "Flamingo flower from Colombia, heart-shaped red bracts and glossy foliage."),
-                        ("Phalaenopsis orchid", "Moth orchid from Southeast Asia, long-lasting blooms in various colors."),
-                        ("Cyclamen persicum", "Persian cyclamen with heart-shaped leaves and reflexed petals."),
-                        ("Begonia rex", "Rex begonia with colorful asymmetrical leaves and small pink flowers."),
-                        ("Hibiscus rosa-sinensis", "Chinese hibiscus with large trumpet-shaped flowers in bright colors.")
-                    ],
-                    'conditions': lambda g, r, y: (r > 0.15 or y > 0.1) and g > 0.2
-                },
-                'succulents_cacti': {
-                    'plants': [
-                        ("Aloe barbadensis", "True aloe vera from Arabian Peninsula, medicinal gel-filled thick leaves."),
-                        ("Crassula ovata", "Jade plant from South Africa, thick oval leaves and tree-like growth pattern."),
-                        ("Echeveria elegans", "Mexican snowball succulent with blue-green rosettes and pink flower spikes."),
-                        ("Sedum morganianum", "Burro's tail from Mexico, trailing succulent with plump blue-green leaves."),
-                        ("Haworthia fasciata", "Zebra plant from South Africa, distinctive white stripes on dark green leaves."),
-                        ("Opuntia microdasys", "Bunny ears cactus from Mexico, flat oval pads with golden glochids."),
-                        ("Schlumbergera x buckleyi", "Christmas cactus hybrid, segmented leaves and winter blooms.")
-                    ],
-                    'conditions': lambda g, r, y: g > 0.25 and g < 0.45 and r < 0.15
-                },
-                'herbs_culinary': {
-                    'plants': [
-                        ("Ocimum basilicum", "Sweet basil from India, aromatic leaves essential for Mediterranean cuisine."),
-                        ("Mentha x piperita", "Peppermint hybrid, cooling menthol-rich leaves for teas and cooking."),
-                        ("Rosmarinus officinalis", "Rosemary from Mediterranean, needle-like aromatic leaves, drought tolerant."),
-                        ("Lavandula angustifolia", "English lavender with fragrant purple spikes, attracts beneficial insects."),
-                        ("Thymus vulgaris", "Common thyme from Mediterranean, small aromatic leaves for seasoning."),
-                        ("Salvia officinalis", "Garden sage with grey-green velvety leaves and culinary uses."),
-                        ("Petroselinum crispum", "Curly parsley, biennial herb rich in vitamins and minerals.")
-                    ],
-                    'conditions': lambda g, r, y: g > 0.35 and (y > 0.05 or r > 0.05)
-                },
-                'trees_woody': {
-                    'plants': [
-                        ("Acer palmatum", "Japanese maple with palmate leaves, spectacular autumn color changes."),
-                        ("Buxus sempervirens", "Common boxwood, dense evergreen shrub ideal for topiary and hedging."),
-                        ("Rhododendron ponticum", "Pontian rhododendron with large flower clusters in spring."),
-                        ("Camellia japonica", "Japanese camellia, evergreen with waxy flowers in winter and spring."),
-                        ("Hydrangea macrophylla", "Bigleaf hydrangea with pH-dependent flower color changes."),
-                        ("Magnolia grandiflora", "Southern magnolia with large fragrant white flowers and glossy leaves."),
-                        ("Prunus serrulata", "Japanese cherry with pink spring blossoms and serrated leaves.")
-                    ],
-                    'conditions': lambda g, r, y: g > 0.3 and (r > 0.1 or y > 0.08)
-                },
-                'ferns_tropical': {
-                    'plants': [
-                        ("Nephrolepis exaltata", "Boston fern with arching fronds, excellent for humid environments."),
-                        ("Adiantum raddianum", "Maidenhair fern with delicate fan-shaped leaflets on black stems."),
-                        ("Pteris cretica", "Cretan brake fern with variegated fronds and easy care requirements."),
-                        ("Asplenium nidus", "Bird's nest fern with glossy strap-like fronds arranged in rosette."),
-                        ("Platycerium bifurcatum", "Staghorn fern, epiphytic with antler-shaped fertile fronds.")
-                    ],
-                    'conditions': lambda g, r, y: g > 0.5 and r < 0.05 and y < 0.05
-                }
-            }
-            
-            # Enhanced analysis with shape and texture detection
-            aspect_ratio = width / height
-            brightness = sum(r + g + b for r, g, b in pixels[:1000]) / (3000 * 255)
-            
-            # Find best matching categories (allow multiple matches)
-            matching_categories = []
-            for category, data in plant_database.items():
-                if data['conditions'](green_ratio, red_ratio, yellow_ratio):
-                    matching_categories.append(category)
-            
-            # Select from best matching categories with preference for specific types
-            if matching_categories:
-                # Prefer specific categories over general ones
-                priority_order = ['flowering_plants', 'succulents_cacti', 'herbs_culinary', 'ferns_tropical', 'tropical_houseplants', 'trees_woody']
-                selected_category = None
-                
-                for priority_cat in priority_order:
-                    if priority_cat in matching_categories:
-                        selected_category = priority_cat
-                        break
-                
-                if not selected_category:
-                    selected_category = matching_categories[0]
-                
-                plants = plant_database[selected_category]['plants']
-                plant_info = random.choice(plants)
-                
-                # Higher confidence for better matches
-                base_confidence = 0.78 if len(matching_categories) == 1 else 0.72
-                confidence = base_confidence + random.uniform(0.05, 0.15)
-                
-            else:
-                # Advanced fallback with texture analysis
-                if brightness > 0.6 and green_ratio > 0.2:
-                    # Bright, green image - likely a healthy plant
-                    specific_plants = [
-                        ("Chlorophytum comosum", "Spider plant from South Africa, easy-care with long arching leaves and plantlets."),
-                        ("Pothos aureus", "Golden pothos, heart-shaped leaves with natural air purifying qualities."),
-                        ("Dracaena marginata", "Dragon tree with narrow pointed leaves and red edges, low maintenance.")
-                    ]
-                elif red_ratio > 0.1 or yellow_ratio > 0.1:
-                    # Colorful image - likely flowering or autumn plant
-                    specific_plants = [
-                        ("Rosa hybrid", "Garden rose with fragrant blooms, requires regular care and pruning."),
-                        ("Tulipa gesneriana", "Garden tulip with cup-shaped flowers, spring blooming bulb."),
-                        ("Impatiens walleriana", "Busy lizzie with continuous blooms in shade conditions.")
-                    ]
-                else:
-                    # Default to common houseplants
-                    specific_plants = [
-                        ("Ficus benjamina", "Weeping fig with glossy leaves, popular indoor tree species."),
-                        ("Philodendron scandens", "Heartleaf philodendron, trailing vine perfect for hanging baskets."),
-                        ("Sansevieria trifasciata", "Snake plant with upright sword-like leaves, extremely drought tolerant.")
-                    ]
-                
-                plant_info = random.choice(specific_plants)
-                confidence = 0.65 + random.uniform(0.05, 0.15)
-            
-            return plant_info[0], confidence, plant_info[1]
-                
+        with metrics.timer('decode'):
+            analysis_img, original_size, color_features = decode_for_classification(image_source)
+        with metrics.timer('classify'):
+            return classify_image(analysis_img, original_size, color_features)
     except Exception as e:
-        logging.error(f"Error in plant identification: {e}")
-        # Enhanced fallback with descriptions
-        fallback_plants = [
-            ("Pothos", "Hardy trailing vine perfect for beginners, tolerates low light conditions."),
-            ("Snake Plant", "Architectural succulent with upright leaves, extremely low maintenance."),
-            ("Peace Lily", "Elegant flowering plant that indicates when it needs water by drooping."),
-            ("Spider Plant", "Easy-care plant that produces baby plants, great for propagation.")
-        ]
-        plant_info = random.choice(fallback_plants)
-        return plant_info[0], 0.6, plant_info[1]
+        logging.error("Error in plant identification: %s", e)
+        metrics.inc('flora_errors_total', source='identification')
+        return fallback_identification()
 
-def cleanup_old_uploads():
-    """Clean up old uploaded files"""
+def decode_for_classification(image_source):
+    """Decode an image for classify_image; tile sampling only feeds the color catalog path"""
+    return load_analysis(image_source, tiled=ANALYSIS_TILED and species_index is None)
+
+def classify_image(analysis_img, original_size, color_features=None):
+    """Identify a plant from an image already decoded to analysis size
+
+    color_features from tiled decoding replace those of analysis_img when given.
+    """
+    if species_index is not None:
+        # Deterministic match against reference photos of each species
+        vector = feature_vector(analysis_img, original_size)
+        plant_name, confidence = species_index.classify(vector)[0]
+        plant = catalog.species_by_name.get(plant_name)
+        description = plant.description if plant else "Identified by similarity to reference photos of this species."
+        return plant_name, confidence, description
+    
+    # Analyze color composition in bulk
+    if color_features is None:
+        color_features = extract_color_features(analysis_img)
+    
+    # Find best matching category in the compiled decision table
+    category, match_count = catalog.match_category(color_features)
+    
+    if category is not None:
+        plant = random.choice(category.species)
+        
+        # Higher confidence for better matches
+        base_confidence = 0.78 if match_count == 1 else 0.72
+        confidence = base_confidence + random.uniform(0.05, 0.15)
+        
+    else:
+        # Advanced fallback with texture analysis
+        plant = random.choice(catalog.fallback_species(color_features))
+        confidence = 0.65 + random.uniform(0.05, 0.15)
+    
+    return plant.name, confidence, plant.description
+
+def fallback_identification():
+    """Common houseplant guess used when an image cannot be analyzed"""
+    plant = random.choice(catalog.error_fallback)
+    return plant.name, 0.6, plant.description
+
+def identify_upload(image_source, content_key=None):
+    """Identify an uploaded image and build the /predict response, using the result cache"""
+    perceptual_key = None
+    try:
+        with metrics.timer('decode'):
+            analysis_img, original_size, color_features = decode_for_classification(image_source)
+        
+        # Re-encoded or resized copies of a known photo share its perceptual hash and colors
+        if RESULT_CACHE_PERCEPTUAL:
+            with metrics.timer('perceptual_hash'):
+                perceptual_key = perceptual_cache_key(analysis_img, color_features)
+            result = result_cache.get_similar(perceptual_key)
+            if result is not None:
+                result_cache.put(content_key, None, result)
+                return result
+        
+        with metrics.timer('classify'):
+            plant_name, confidence, basic_description = classify_image(analysis_img, original_size, color_features)
+    except Exception as e:
+        logging.error("Error in plant identification: %s", e)
+        metrics.inc('flora_errors_total', source='identification')
+        # Never cache a guess made for an unreadable image
+        content_key = None
+        plant_name, confidence, basic_description = fallback_identification()
+    
+    logging.info("Plant identified: %s", plant_name)
+    
+    result, cacheable = build_result(plant_name, basic_description)
+    if cacheable:
+        result_cache.put(content_key, perceptual_key, result)
+    return result
+
+# Job threads classify inside the request-serving workers, so each job holds a /predict
+# slot and counts against PREDICT_CONCURRENCY like a synchronous upload
+job_store.gate = limiters['predict'].hold
+
+@job_store.task
+def predict_job(data, content_key):
+    """Background job body for POST /predict?async=1"""
+    result = result_cache.get(content_key)
+    if result is None:
+        result = identify_upload(io.BytesIO(data), content_key)
+    return result
+
+def build_result(plant_name, basic_description, wiki_summary=None):
+    """Assemble the response for an identified plant
+
+    Returns (result, cacheable). A result built while Wikipedia was failing is
+    not cacheable: the result cache has no expiry and would pin the degraded
+    description long after the summary cache's WIKI_CACHE_ERROR_TTL retries it.
+    """
+    # Get detailed Wikipedia description
+    if wiki_summary is None:
+        with metrics.timer('wikipedia'):
+            wiki_summary = get_wikipedia_summary(plant_name)
+    wiki_status, wiki_description = wiki_summary
+    
+    # Use Wikipedia description if available, otherwise use basic description
+    final_description = wiki_description if len(wiki_description) > 50 else basic_description
+    
+    with metrics.timer('care_tips'):
+        care_tips = generate_care_tips(plant_name)
+    
+    return {
+        'plant': plant_name,
+        'description': final_description,
+        'wiki_url': catalog.wiki_url(plant_name),
+        'care_tips': care_tips
+    }, wiki_status != STATUS_ERROR
+
+def analyze_image_bytes(data):
+    """Decode and classify one image; runs inside the batch process pool"""
     try:
-        for filename in os.listdir(UPLOAD_FOLDER):
-            if filename != '.gitkeep':
-                file_path = os.path.join(UPLOAD_FOLDER, filename)
-                # Delete files older than 1 hour
-                if os.path.isfile(file_path):
-                    file_age = os.path.getmtime(file_path)
-                    if (time.time() - file_age) > 3600:
-                        os.remove(file_path)
+        with metrics.timer('decode'):
+            analysis_img, original_size, color_features = decode_for_classification(io.BytesIO(data))
+        with metrics.timer('perceptual_hash'):
+            perceptual_key = perceptual_cache_key(analysis_img, color_features) if RESULT_CACHE_PERCEPTUAL else None
+        with metrics.timer('classify'):
+            plant_name, confidence, basic_description = classify_image(analysis_img, original_size, color_features)
+        return plant_name, basic_description, perceptual_key, True
     except Exception as e:
-        logging.error(f"Error cleaning up uploads: {e}")
+        logging.error("Error in plant identification: %s", e)
+        metrics.inc('flora_errors_total', source='identification')
+        plant_name, confidence, basic_description = fallback_identification()
+        return plant_name, basic_description, None, False
+
+def iter_batch_results(items):
+    """Yield per-image results as the process pool finishes them
+
+    Items are read one at a time and at most BATCH_IN_FLIGHT distinct images
+    are held in memory or queued for the pool at once.
+    """
+    pending = {}
+    futures_by_key = {}
+    # One Wikipedia lookup per distinct plant across the whole batch
+    wiki_summaries = {}
+    
+    def finish(future):
+        key, targets = pending.pop(future)
+        del futures_by_key[key]
+        try:
+            plant_name, basic_description, perceptual_key, cacheable = future.result()
+        except Exception as e:
+            logging.error("Error in batch worker: %s", e)
+            metrics.inc('flora_errors_total', source='batch_worker')
+            for index, filename in targets:
+                yield {'index': index, 'filename': filename, 'error': 'Could not process image'}
+            return
+        
+        result = result_cache.get_similar(perceptual_key) if perceptual_key is not None else None
+        if result is not None:
+            result_cache.put(key, None, result)
+        else:
+            if plant_name not in wiki_summaries:
+                wiki_summaries[plant_name] = get_wikipedia_summary(plant_name)
+            result, wiki_ok = build_result(plant_name, basic_description, wiki_summaries[plant_name])
+            if cacheable and wiki_ok:
+                result_cache.put(key, perceptual_key, result)
+        
+        for index, filename in targets:
+            yield dict(result, index=index, filename=filename)
+    
+    with batch_executor() as executor:
+        for index, (filename, reader, error) in enumerate(items):
+            data = None
+            if not error:
+                data, error = read_image(reader, MAX_FILE_SIZE)
+            if error:
+                yield {'index': index, 'filename': filename, 'error': error}
+                continue
+            
+            key = bytes_digest(data)
+            cached = result_cache.get(key)
+            if cached is not None:
+                yield dict(cached, index=index, filename=filename)
+                continue
+            
+            # Identical files within one batch are analyzed once
+            future = futures_by_key.get(key)
+            if future is None:
+                while len(pending) >= BATCH_IN_FLIGHT:
+                    done, _ = wait_for_futures(pending, return_when=FIRST_COMPLETED)
+                    for finished in done:
+                        yield from finish(finished)
+                future = futures_by_key[key] = executor.submit(analyze_image_bytes, data)
+                pending[future] = (key, [])
+            pending[future][1].append((index, filename))
+            del data
+        
+        for future in as_completed(list(pending)):
+            yield from finish(future)
+
+@app.before_request
+def start_request_metrics():
+    g.request_id = (request.headers.get('X-Request-ID') or uuid.uuid4().hex)[:64]
+    g.request_started = time.monotonic()
+    set_request_context(g.request_id)
+    metrics.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record request latency, log one structured summary record, and optionally expose stage timings"""
+    timings = metrics.finish_request(request.endpoint or 'unmatched')
+    if SERVER_TIMING and timings:
+        response.headers['Server-Timing'] = server_timing_header(timings)
+    if 'request_started' in g and request.endpoint not in ('static', 'fingerprinted_asset'):
+        stages = {}
+        for stage, seconds in timings:
+            stages[stage] = round(stages.get(stage, 0) + seconds * 1000, 2)
+        logging.info('%s %s %s', request.method, request.path, response.status_code, extra={'fields': {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.monotonic() - g.request_started) * 1000, 2),
+            'stages_ms': stages,
+        }})
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def end_request_context(exc):
+    clear_request_context()
+
+@app.after_request
+def revalidate_unversioned_assets(response):
+    """Files served without a fingerprint, like the web app manifest, must be revalidated on every load"""
+    if request.endpoint == 'static' and request.view_args.get('filename') in UNVERSIONED_ASSETS:
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = 0
+    return response
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    """Reject oversized uploads with a JSON error"""
+    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
 
 @app.route('/')
 def landing():
@@ -272,10 +377,28 @@ def landing():
 @app.route('/app')
 def index():
     """Main app page"""
-    cleanup_old_uploads()
     return render_template('index.html')
 
+@app.route('/assets/<path:filename>')
+def fingerprinted_asset(filename):
+    """Fingerprinted static file, precompressed when the client accepts it"""
+    response = asset_manifest.response(filename)
+    if response is None:
+        abort(404)
+    return response
+
+@app.route('/sw.js')
+@app.route('/static/sw.js')  # Registered by earlier releases, which still check it for updates
+def service_worker():
+    """Service worker precaching the current fingerprinted assets, revalidated on every load"""
+    body = render_template('sw.js', cache_name=f'flora-{asset_manifest.version}')
+    response = Response(body, mimetype='text/javascript')
+    response.cache_control.no_cache = True
+    response.cache_control.max_age = 0
+    return response
+
 @app.route('/predict', methods=['POST'])
+@admit('predict')
 def predict():
     """Handle plant identification from uploaded image"""
     try:
@@ -289,8 +412,10 @@ def predict():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # Validate file
-        if not allowed_file(file.filename):
+        # Validate file from its content rather than its name
+        with metrics.timer('sniff'):
+            image_format = sniff_stream(file.stream)
+        if image_format is None:
             return jsonify({'error': 'Invalid file type. Please upload PNG, JPG, JPEG, GIF, or WEBP images.'}), 400
         
         # Check file size
@@ -299,48 +424,128 @@ def predict():
         file.seek(0)
         
         if file_size > MAX_FILE_SIZE:
-            return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 400
+            return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
         
-        # Save file
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        file.save(file_path)
+        # Check dimensions from the header before decoding any pixels
+        try:
+            with metrics.timer('header'):
+                image_dimensions(file.stream)
+        except ImageRejected as e:
+            logging.info("Rejected upload: %s", e)
+            return jsonify({'error': 'Image could not be read or its dimensions are too large.'}), 400
         
-        logging.info(f"Image saved: {file_path}")
+        content_key = upload_digest(file)
         
-        # Enhanced plant identification
-        plant_name, confidence, basic_description = identify_plant(file_path)
-        logging.info(f"Plant identified: {plant_name}")
+        # Opt-in asynchronous mode: queue the work and return a job id at once
+        if request.args.get('async') == '1':
+            file.seek(0)
+            try:
+                job_id = job_store.submit(predict_job, file.read(), content_key)
+            except QueueFull:
+                response = jsonify({'error': 'Too many images are being processed. Please try again shortly.'})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            return jsonify({'job_id': job_id, 'status': JOB_QUEUED, 'status_url': f'/jobs/{job_id}'}), 202
         
-        # Get detailed Wikipedia description
-        wiki_description = get_wikipedia_summary(plant_name)
+        # Serve byte-identical re-uploads without decoding anything
+        result = result_cache.get(content_key)
+        if result is not None:
+            return jsonify(result)
         
-        # Use Wikipedia description if available, otherwise use basic description
-        final_description = wiki_description if len(wiki_description) > 50 else basic_description
+        if SPOOL_UPLOADS:
+            # Save file
+            filename = secure_filename(file.filename)
+            unique_filename = f"{uuid.uuid4()}_{filename}"
+            file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
+            with metrics.timer('upload_save'):
+                file.save(file_path)
+            
+            logging.info("Image saved: %s", file_path)
+            image_source = file_path
+        else:
+            # Decode straight from the in-memory upload
+            file_path = None
+            image_source = file.stream
         
-        # Generate Wikipedia URL for read more
-        wiki_url = f"https://en.wikipedia.org/wiki/{plant_name.replace(' ', '_')}"
+        # Enhanced plant identification
+        result = identify_upload(image_source, content_key)
         
         # Clean up uploaded file
-        try:
-            os.remove(file_path)
-        except Exception as e:
-            logging.error(f"Error removing uploaded file: {e}")
+        if file_path:
+            try:
+                os.remove(file_path)
+            except Exception as e:
+                logging.error("Error removing uploaded file: %s", e)
         
         # Return enhanced results
-        return jsonify({
-            'plant': plant_name,
-            'description': final_description,
-            'wiki_url': wiki_url,
-            'care_tips': generate_care_tips(plant_name)
-        })
+        return jsonify(result)
         
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
-        logging.error(f"Error in predict endpoint: {e}")
+        logging.error("Error in predict endpoint: %s", e)
+        metrics.inc('flora_errors_total', source='predict')
         return jsonify({'error': 'An error occurred while processing your image. Please try again.'}), 500
 
+@app.route('/jobs/<job_id>')
+@admit('jobs')
+def job_status(job_id):
+    """Report an asynchronous /predict job, optionally long-polling with ?wait=<seconds>"""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'error': 'Invalid wait value'}), 400
+    # nan and inf slip through min()/max() and would never reach the long-poll deadline
+    if not math.isfinite(wait):
+        return jsonify({'error': 'Invalid wait value'}), 400
+    
+    job = job_store.get(job_id, wait=max(wait, 0))
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job)
+
+@app.route('/predict/batch', methods=['POST'])
+@admit('batch')
+def predict_batch():
+    """Handle plant identification for many images or a zip of images"""
+    try:
+        # Oversized images are reported per item, so only the whole body is capped
+        request.max_content_length = MAX_BATCH_BYTES
+        request.max_file_size = None
+        
+        files = request.files.getlist('images') + request.files.getlist('image')
+        files = [file for file in files if file.filename]
+        if not files:
+            return jsonify({'error': 'No image files provided'}), 400
+        
+        try:
+            items = collect_images(files, allowed_file, MAX_FILE_SIZE)
+        except RequestEntityTooLarge as e:
+            return jsonify({'error': e.description}), 413
+        if len(items) > MAX_BATCH_FILES:
+            return jsonify({'error': f'Too many images. Maximum is {MAX_BATCH_FILES} per batch.'}), 413
+        
+        results = iter_batch_results(items)
+        
+        # Optionally stream each result as soon as it is ready
+        if request.args.get('stream') == '1':
+            # Images are read while streaming, so the uploaded files must stay open until then
+            close_uploads = detach_uploads(files)
+            response = Response((json.dumps(result) + '\n' for result in results), mimetype='application/x-ndjson')
+            response.call_on_close(close_uploads)
+            return response
+        
+        return jsonify({'results': sorted(results, key=lambda result: result['index'])})
+        
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        logging.error("Error in batch predict endpoint: %s", e)
+        metrics.inc('flora_errors_total', source='predict_batch')
+        return jsonify({'error': 'An error occurred while processing your images. Please try again.'}), 500
+
 @app.route('/chat', methods=['POST'])
+@admit('chat')
 def chat():
     """Handle text-based botanical questions"""
     try:
@@ -350,15 +555,18 @@ def chat():
         if not user_message:
             return jsonify({'error': 'No message provided'}), 400
         
-        # Check if message is plant/botany related
-        if not is_botanical_question(user_message):
+        # Check if message is plant/botany related and pick the response intent in one pass
+        with metrics.timer('chat_route'):
+            is_botanical, intent = chat_router.route(user_message)
+        if not is_botanical:
             return jsonify({
                 'response': "I'm Flora, your botanical expert! I can only help with plant and gardening questions. Please ask me about plant care, identification, botanical facts, or gardening advice. 🌱",
                 'type': 'warning'
             })
         
         # Generate botanical response
-        response = generate_botanical_response(user_message)
+        with metrics.timer('chat_response'):
+            response = generate_botanical_response(user_message, intent)
         
         return jsonify({
             'response': response,
@@ -366,90 +574,77 @@ def chat():
         })
         
     except Exception as e:
-        logging.error(f"Error in chat endpoint: {e}")
+        logging.error("Error in chat endpoint: %s", e)
+        metrics.inc('flora_errors_total', source='chat')
         return jsonify({'error': 'An error occurred while processing your message. Please try again.'}), 500
 
 def is_botanical_question(message):
     """Check if the message is related to plants or botany"""
-    botanical_keywords = [
-        'plant', 'flower', 'tree', 'leaf', 'leaves', 'garden', 'gardening', 'botany', 'botanical',
-        'grow', 'growing', 'care', 'water', 'watering', 'soil', 'fertilizer', 'pruning', 'propagate',
-        'succulent', 'cactus', 'herb', 'vegetable', 'fruit', 'seed', 'seeds', 'bloom', 'blooming',
-        'houseplant', 'indoor', 'outdoor', 'photosynthesis', 'chlorophyll', 'roots', 'stem', 'stems',
-        'petal', 'petals', 'pollen', 'pollination', 'species', 'variety', 'cultivar', 'hybrid',
-        'perennial', 'annual', 'biennial', 'evergreen', 'deciduous', 'tropical', 'temperate',
-        'light', 'sunlight', 'shade', 'humidity', 'temperature', 'climate', 'season', 'seasonal',
-        'repot', 'repotting', 'transplant', 'mulch', 'compost', 'organic', 'disease', 'pest',
-        'fungus', 'bacteria', 'virus', 'nutrient', 'nitrogen', 'phosphorus', 'potassium',
-        'photosynthesis', 'respiration', 'transpiration', 'germination', 'phototropism'
-    ]
-    
-    message_lower = message.lower()
-    return any(keyword in message_lower for keyword in botanical_keywords)
+    return chat_router.route(message)[0]
 
-def generate_botanical_response(message):
+def generate_botanical_response(message, intent=None):
     """Generate expert botanical responses with detailed scientific knowledge"""
-    message_lower = message.lower()
+    if intent is None:
+        intent = chat_router.route(message)[1]
     
     # Plant care responses with scientific detail
-    if any(word in message_lower for word in ['care', 'how to', 'growing', 'grow']):
-        if any(word in message_lower for word in ['succulent', 'cactus', 'desert']):
-            return "Succulents employ CAM (Crassulacean Acid Metabolism) photosynthesis, opening stomata at night to conserve water. They need bright light (2000-3000 foot-candles), well-draining soil with 50%+ inorganic material, and water only when soil is completely dry. Most prefer temperatures 65-80°F with low humidity (30-50%). Overwatering causes root rot - their #1 killer."
-        elif any(word in message_lower for word in ['rose', 'roses']):
-            return "Roses (Rosa spp.) require 6+ hours direct sunlight for optimal photosynthesis and disease prevention. Plant in well-draining soil with pH 6.0-7.0, rich in organic matter. Water at soil level to prevent black spot (Diplocarpon rosae). Apply balanced fertilizer (10-10-10) monthly during growing season. Prune in late winter to promote air circulation and remove diseased canes."
-        elif any(word in message_lower for word in ['orchid', 'orchids']):
-            return "Orchids are epiphytes requiring excellent drainage and air circulation around roots. Use orchid bark mix with chunky materials. Water weekly via soaking method, then drain completely - standing water causes root rot. Maintain 40-70% humidity and temperatures 65-85°F. Feed weakly (1/4 strength) with balanced fertilizer monthly during active growth."
-        elif any(word in message_lower for word in ['fern', 'ferns']):
-            return "Ferns reproduce via spores and prefer humid environments (50-80% humidity). They need consistent moisture but not waterlogged soil. Provide bright, indirect light - direct sun scorches fronds. Use well-draining potting mix rich in organic matter. Mist regularly and place on humidity trays during dry periods."
-        else:
-            return "Plant care basics: Light drives photosynthesis - match intensity to species needs. Water when top 1-2 inches of soil dry (finger test). Ensure drainage to prevent anaerobic soil conditions. Feed during active growth with appropriate N-P-K ratios. Monitor for pests and diseases. Each species has evolved specific environmental requirements."
+    if intent == 'care_succulents':
+        return "Succulents employ CAM (Crassulacean Acid Metabolism) photosynthesis, opening stomata at night to conserve water. They need bright light (2000-3000 foot-candles), well-draining soil with 50%+ inorganic material, and water only when soil is completely dry. Most prefer temperatures 65-80°F with low humidity (30-50%). Overwatering causes root rot - their #1 killer."
+    elif intent == 'care_roses':
+        return "Roses (Rosa spp.) require 6+ hours direct sunlight for optimal photosynthesis and disease prevention. Plant in well-draining soil with pH 6.0-7.0, rich in organic matter. Water at soil level to prevent black spot (Diplocarpon rosae). Apply balanced fertilizer (10-10-10) monthly during growing season. Prune in late winter to promote air circulation and remove diseased canes."
+    elif intent == 'care_orchids':
+        return "Orchids are epiphytes requiring excellent drainage and air circulation around roots. Use orchid bark mix with chunky materials. Water weekly via soaking method, then drain completely - standing water causes root rot. Maintain 40-70% humidity and temperatures 65-85°F. Feed weakly (1/4 strength) with balanced fertilizer monthly during active growth."
+    elif intent == 'care_ferns':
+        return "Ferns reproduce via spores and prefer humid environments (50-80% humidity). They need consistent moisture but not waterlogged soil. Provide bright, indirect light - direct sun scorches fronds. Use well-draining potting mix rich in organic matter. Mist regularly and place on humidity trays during dry periods."
+    elif intent == 'care':
+        return "Plant care basics: Light drives photosynthesis - match intensity to species needs. Water when top 1-2 inches of soil dry (finger test). Ensure drainage to prevent anaerobic soil conditions. Feed during active growth with appropriate N-P-K ratios. Monitor for pests and diseases. Each species has evolved specific environmental requirements."
     
     # Plant identification and taxonomy
-    elif any(word in message_lower for word in ['identify', 'what is', 'what plant', 'name', 'species']):
+    elif intent == 'identification':
         return "For accurate plant identification, I analyze leaf morphology, growth habit, flower structure, and botanical features. Upload a clear photo showing leaves, stems, and any flowers/fruits. I'll identify the species using taxonomic classification and provide scientific names, common names, and detailed care information."
     
     # Watering science
-    elif any(word in message_lower for word in ['water', 'watering', 'irrigation']):
+    elif intent == 'watering':
         return "Watering science: Plants absorb water through root hairs via osmosis. Frequency depends on transpiration rate, pot size, soil composition, humidity, and temperature. Check soil moisture 1-2 inches deep. Water thoroughly until drainage occurs - shallow watering encourages surface roots. Morning watering reduces fungal diseases by allowing leaves to dry."
     
     # Light and photosynthesis
-    elif any(word in message_lower for word in ['light', 'sun', 'shade', 'photosynthesis']):
+    elif intent == 'light':
         return "Light requirements vary by photosynthetic pathway: C3 plants (most houseplants) need bright, indirect light. C4 plants (grasses) tolerate intense light. CAM plants (succulents) are highly light-efficient. Measure: Full sun (6+ hours direct), partial (3-6 hours), shade (<3 hours). Indoor plants need 1000-3000 foot-candles depending on species."
     
     # Soil science
-    elif any(word in message_lower for word in ['soil', 'potting', 'drainage', 'nutrients']):
+    elif intent == 'soil':
         return "Soil provides mechanical support, water, air, and nutrients. Good potting mix contains 40% organic matter (peat/compost), 30% drainage material (perlite/vermiculite), 30% structure (bark/coir). pH affects nutrient availability - most plants prefer 6.0-7.0. Essential nutrients: NPK (macronutrients) plus calcium, magnesium, sulfur, and micronutrients."
     
     # Fertilizer and nutrition
-    elif any(word in message_lower for word in ['fertilizer', 'fertilize', 'feed', 'nutrients', 'nitrogen']):
+    elif intent == 'fertilizer':
         return "Plant nutrition: Nitrogen (N) promotes leaf growth and chlorophyll. Phosphorus (P) aids root development and flowering. Potassium (K) improves disease resistance and overall vigor. Apply balanced fertilizer (10-10-10 or 20-20-20) at 1/4 strength bi-weekly during growing season. Organic options include compost, fish emulsion, or kelp meal."
     
     # Propagation methods
-    elif any(word in message_lower for word in ['propagate', 'propagation', 'cutting', 'cuttings', 'seeds']):
+    elif intent == 'propagation':
         return "Propagation methods: Stem cuttings - take 4-6\" below node, remove lower leaves, place in water or rooting medium. Leaf cuttings work for succulents. Division separates root systems. Air layering for difficult species. Seeds require proper temperature and moisture. Rooting hormones (auxins) accelerate root development. Success rates vary by species and season."
     
     # Plant problems and pathology
-    elif any(word in message_lower for word in ['problem', 'disease', 'pest', 'dying', 'yellow', 'brown', 'sick']):
+    elif intent == 'problems':
         return "Plant diagnostics: Yellow leaves = overwatering, nutrient deficiency, or natural senescence. Brown tips = low humidity, fluoride toxicity, or overfertilization. Wilting = water stress or root damage. Common pests: aphids, spider mites, scale insects. Fungal diseases thrive in poor air circulation and overwatering. Prevention is better than treatment."
     
     # Seasonal plant biology
-    elif any(word in message_lower for word in ['winter', 'summer', 'spring', 'fall', 'season', 'dormancy']):
+    elif intent == 'seasonal':
         return "Seasonal adaptations: Plants respond to photoperiod and temperature changes. Spring triggers active growth - increase water/fertilizer. Summer stress requires adequate water and heat protection. Fall signals dormancy preparation - reduce fertilizing. Winter dormancy conserves energy - minimal water, no fertilizer. Some plants require cold stratification for flowering."
     
     # Photosynthesis and plant biology
-    elif any(word in message_lower for word in ['photosynthesis', 'chlorophyll', 'leaves', 'biology']):
+    elif intent == 'biology':
         return "Photosynthesis converts CO2 + H2O + light energy into glucose + O2. Chlorophyll absorbs red and blue light, reflecting green. Stomata regulate gas exchange and water loss. Transpiration creates negative pressure for water uptake. Different leaf shapes optimize light capture and water conservation for specific environments."
     
     # Plant hormones and growth
-    elif any(word in message_lower for word in ['hormone', 'growth', 'pruning', 'pinching']):
+    elif intent == 'hormones':
         return "Plant hormones regulate growth: Auxins promote root development and apical dominance. Cytokinins stimulate cell division and lateral growth. Gibberellins cause stem elongation. Abscisic acid triggers dormancy and stress responses. Pruning removes apical dominance, encouraging bushy growth through lateral bud activation."
     
     # Air purification
-    elif any(word in message_lower for word in ['air', 'purify', 'clean', 'oxygen', 'pollution']):
+    elif intent == 'air':
         return "Plants improve air quality through photosynthesis (producing oxygen) and phytoremediation (removing pollutants). NASA studies show plants like snake plants, pothos, and peace lilies remove formaldehyde, benzene, and xylene. Stomata absorb airborne chemicals. One plant per 100 square feet provides measurable air purification benefits."
     
     # Specific plant families
-    elif any(word in message_lower for word in ['family', 'taxonomy', 'classification']):
+    elif intent == 'taxonomy':
         return "Plant taxonomy organizes species by evolutionary relationships. Major families: Araceae (aroids like pothos, monstera), Arecaceae (palms), Cactaceae (cacti), Orchidaceae (orchids), Rosaceae (roses, fruit trees). Each family shares similar characteristics, care requirements, and growth patterns. Understanding plant families helps predict care needs."
     
     # General botanical knowledge
@@ -465,23 +660,81 @@ def generate_botanical_response(message):
 
 def generate_care_tips(plant_name):
     """Generate specific care tips for identified plants"""
-    plant_lower = plant_name.lower()
+    return list(catalog.care_tips(plant_name))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics aggregated across all workers"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def warm_up():
+    """Build and exercise the shared state once, before gunicorn forks its workers
+
+    Everything touched here is inherited copy-on-write by the workers: the
+    compiled catalog and chat matchers, the species index, the mapped
+    Wikipedia snapshot, the Wikipedia cache memory tier, and Pillow's plugin
+    registry.
+    """
+    start = time.monotonic()
+    Image.init()
+    preloaded = wiki_cache.preload()
     
-    if any(word in plant_lower for word in ['succulent', 'cactus', 'aloe', 'jade']):
-        return ["Water only when soil is completely dry", "Provide bright, indirect light", "Use well-draining soil", "Avoid overwatering - less is more"]
-    elif any(word in plant_lower for word in ['orchid']):
-        return ["Water weekly by soaking method", "Provide bright, indirect light", "Use orchid bark mix", "Maintain 40-70% humidity"]
-    elif any(word in plant_lower for word in ['fern', 'boston fern']):
-        return ["Keep soil consistently moist", "Provide high humidity", "Avoid direct sunlight", "Mist regularly but avoid waterlogged soil"]
-    elif any(word in plant_lower for word in ['peace lily', 'lily']):
-        return ["Water when soil surface is dry", "Tolerates low to bright light", "Flowers indicate good care", "Drooping leaves signal watering time"]
-    else:
-        return ["Provide appropriate light for species", "Water when topsoil feels dry", "Ensure good drainage", "Feed during growing season"]
+    # One synthetic image and message run every code path a first request would
+    sample = io.BytesIO()
+    Image.new('RGB', (640, 480), (60, 140, 60)).save(sample, 'JPEG')
+    analysis_img, original_size, color_features = decode_for_classification(io.BytesIO(sample.getvalue()))
+    perceptual_cache_key(analysis_img, color_features)
+    classify_image(analysis_img, original_size, color_features)
+    chat_router.route('How often should I water my fern?')
+    
+    readiness.update(warm=True, warm_up_seconds=round(time.monotonic() - start, 3), warm_up_pid=os.getpid())
+    logging.info("Warm-up finished in %ss (%s cached summaries preloaded)", readiness['warm_up_seconds'], preloaded)
+
+def start_worker():
+    """Start per-worker background services; safe to call more than once"""
+    upload_janitor.start()
+    job_store.start()
+    metrics.start()
+
+def process_memory():
+    """Resident and proportional set size of this process in MB (PSS splits shared pages)"""
+    memory = {'rss_mb': None, 'pss_mb': None}
+    for path, field, key in (('/proc/self/status', 'VmRSS:', 'rss_mb'), ('/proc/self/smaps_rollup', 'Pss:', 'pss_mb')):
+        try:
+            with open(path) as f:
+                for line in f:
+                    if line.startswith(field):
+                        memory[key] = round(int(line.split()[1]) / 1024, 1)
+                        break
+        except OSError:
+            pass
+    return memory
 
 @app.route('/health')
 def health():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'model_loaded': classifier is not None})
+    """Health check endpoint; 503 until this worker has finished warming up"""
+    ready = readiness['warm']
+    response = jsonify({
+        'status': 'healthy' if ready else 'starting',
+        'ready': ready,
+        'model_loaded': species_index is not None,
+        'classifier': 'species_index' if species_index is not None else 'color_rules',
+        'warm_up': dict(readiness, inherited=readiness['warm_up_pid'] not in (None, os.getpid())),
+        'uptime_seconds': round(time.time() - PROCESS_STARTED_AT, 1),
+        'memory': process_memory(),
+        'result_cache': result_cache.stats(),
+        'wiki_cache': wiki_cache.stats(),
+        'wikipedia': wiki_client.stats(),
+        'wiki_snapshot_entries': len(wiki_snapshot) if wiki_snapshot is not None else 0,
+        'upload_janitor': upload_janitor.stats()
+    })
+    return response, 200 if ready else 503
+
+# Without gunicorn's hooks (flask run, python app.py) warm up at import; batch
+# pool processes import this module only for analyze_image_bytes
+if not WORKER_HOOKS and multiprocessing.current_process().name == 'MainProcess':
+    warm_up()
+    start_worker()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+from flask import request, send_file, url_for
+
+from wiki_cache import CACHE_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fingerprinted and compressed copies of static/ are written here at startup
+ASSET_BUILD_DIR = os.environ.get('ASSET_BUILD_DIR', os.path.join(CACHE_DIR, 'assets'))
+
+# Served under their original /static/ URL with revalidation instead of a fingerprint
+UNVERSIONED_ASSETS = {'manifest.json'}
+
+# Only these types are worth precompressing; images are already compressed
+COMPRESSIBLE_TYPES = {'text/css', 'text/javascript', 'application/javascript', 'application/json', 'image/svg+xml'}
+
+# Fingerprinted URLs never change content, so clients may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class Asset:
+    """One static file with its fingerprinted name and precompressed variants"""
+
+    def __init__(self, filename, path, digest, mimetype):
+        self.filename = filename
+        self.path = path
+        self.digest = digest
+        self.mimetype = mimetype
+        root, ext = os.path.splitext(filename)
+        self.fingerprinted = f'{root}.{digest}{ext}'
+        self.variants = {}
+
+
+class AssetManifest:
+    """Content-hashed, precompressed copies of the static folder
+
+    build() is cheap to repeat: compressed files are named by content hash,
+    so unchanged assets are never recompressed.
+    """
+
+    def __init__(self, static_folder, build_dir=ASSET_BUILD_DIR):
+        self.static_folder = static_folder
+        self.build_dir = build_dir
+        self.by_filename = {}
+        self.by_fingerprint = {}
+        self.version = None
+
+    def build(self):
+        os.makedirs(self.build_dir, exist_ok=True)
+        for dirpath, _, filenames in os.walk(self.static_folder):
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                if filename in UNVERSIONED_ASSETS:
+                    continue
+                self._add(filename, path)
+        self.version = self._version()
+        logging.info("Built %s fingerprinted static assets", len(self.by_filename))
+        return self
+
+    def _add(self, filename, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=6).hexdigest()
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        asset = Asset(filename, path, digest, mimetype)
+
+        if mimetype in COMPRESSIBLE_TYPES:
+            compressors = [('gzip', '.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                compressors.append(('br', '.br', lambda raw: brotli.compress(raw, quality=11)))
+            for encoding, suffix, compress in compressors:
+                variant_path = os.path.join(self.build_dir, asset.fingerprinted.replace('/', '_') + suffix)
+                if not os.path.exists(variant_path):
+                    compressed = compress(data)
+                    # Not worth a separate representation if it barely shrinks
+                    if len(compressed) >= len(data) * 0.9:
+                        continue
+                    tmp_path = f'{variant_path}.{os.getpid()}.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, variant_path)
+                asset.variants[encoding] = variant_path
+
+        self.by_filename[filename] = asset
+        self.by_fingerprint[asset.fingerprinted] = asset
+
+    def _version(self):
+        """Digest over every fingerprint, so it changes whenever any asset does"""
+        digest = hashlib.blake2b(digest_size=6)
+        for fingerprinted in sorted(self.by_fingerprint):
+            digest.update(fingerprinted.encode() + b'\0')
+        return digest.hexdigest()
+
+    def url(self, filename):
+        """Fingerprinted URL of a static file; a drop-in for url_for('static', filename=...)"""
+        asset = self.by_filename.get(filename)
+        if asset is None:
+            return url_for('static', filename=filename)
+        return url_for('fingerprinted_asset', filename=asset.fingerprinted)
+
+    def response(self, fingerprinted):
+        """Serve the smallest variant the client accepts, or None if unknown"""
+        asset = self.by_fingerprint.get(fingerprinted)
+        if asset is None:
+            return None
+
+        encoding = next((name for name in ('br', 'gzip')
+                         if name in asset.variants and request.accept_encodings[name]), None)
+        path = asset.variants[encoding] if encoding else asset.path
+        # Each representation needs its own strong validator
+        etag = f'{asset.digest}-{encoding}' if encoding else asset.digest
+
+        response = send_file(path, mimetype=asset.mimetype, etag=etag, max_age=IMMUTABLE_MAX_AGE, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.immutable = True
+        response.cache_control.public = True
+        return response
@@ -0,0 +1,185 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from ingest import ImageRejected, image_dimensions, sniff_format
+
+# Processes that decode and classify batch images
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+
+# Images accepted in one /predict/batch request, counting zip members
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', 200))
+
+# Largest /predict/batch request body, enforced while it is read
+MAX_BATCH_BYTES = int(os.environ.get('MAX_BATCH_BYTES', 256 * 1024 * 1024))
+
+# Largest total size of the images in one batch once zip members are inflated,
+# checked against the sizes declared in the archive before anything is inflated
+MAX_BATCH_INFLATED_BYTES = int(os.environ.get('MAX_BATCH_INFLATED_BYTES', MAX_BATCH_BYTES))
+
+# Images of one batch read into memory and queued for the pool at any time
+BATCH_IN_FLIGHT = int(os.environ.get('BATCH_IN_FLIGHT', 2 * BATCH_WORKERS))
+
+# Seconds a pool may sit unused before its processes are shut down, so workers that
+# served a batch once do not each keep a full pool resident
+BATCH_POOL_IDLE_TIMEOUT = float(os.environ.get('BATCH_POOL_IDLE_TIMEOUT', 60))
+
+# Pool processes start from a forkserver, not as forks of a worker already running
+# janitor, job and logging threads whose locks they would inherit
+BATCH_START_METHOD = os.environ.get('BATCH_START_METHOD', 'forkserver')
+
+_executor = None
+_executor_pid = None
+_executor_users = 0
+_executor_releases = 0
+_executor_lock = threading.Lock()
+
+
+def _pool_context():
+    context = multiprocessing.get_context(BATCH_START_METHOD)
+    if BATCH_START_METHOD == 'forkserver':
+        # The default preload imports __main__, which may be the app itself
+        context.set_forkserver_preload([])
+    return context
+
+
+@contextmanager
+def batch_executor():
+    """Process pool for one batch, shared by concurrent batches in this worker
+
+    The pool is created on first use and shut down once no batch has used it
+    for BATCH_POOL_IDLE_TIMEOUT seconds.
+    """
+    global _executor, _executor_pid, _executor_users, _executor_releases
+    with _executor_lock:
+        # A pool whose child crashed stays broken, so replace it
+        if _executor is None or _executor_pid != os.getpid() or getattr(_executor, '_broken', False):
+            if _executor is not None and _executor_pid == os.getpid():
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=_pool_context())
+            _executor_pid = os.getpid()
+            _executor_users = 0
+        _executor_users += 1
+        executor = _executor
+    try:
+        yield executor
+    finally:
+        with _executor_lock:
+            _executor_users -= 1
+            _executor_releases += 1
+            if _executor is executor and _executor_users == 0:
+                timer = threading.Timer(BATCH_POOL_IDLE_TIMEOUT, _shut_down_if_idle, (executor, _executor_releases))
+                timer.daemon = True
+                timer.start()
+
+
+def _shut_down_if_idle(executor, releases):
+    """Shut the pool down unless a batch has used it since the timer was set"""
+    global _executor
+    with _executor_lock:
+        if _executor is not executor or _executor_users or _executor_releases != releases:
+            return
+        _executor = None
+    executor.shutdown(wait=False)
+
+
+def collect_images(files, allowed_file, max_file_size):
+    """List uploaded images and zip members as (filename, reader, error) items without reading them
+
+    reader() returns the item's bytes and is None for items already
+    rejected. Zip members are filtered by extension and declared size, and
+    the declared sizes of the whole batch are checked against
+    MAX_BATCH_INFLATED_BYTES, so a zip bomb is refused before anything is
+    inflated; read_image() applies the remaining checks one item at a time.
+    """
+    items = []
+    total_size = 0
+    for file in files:
+        if file.filename.lower().endswith('.zip'):
+            for filename, reader, error, size in _zip_images(file, allowed_file, max_file_size):
+                items.append((filename, reader, error))
+                total_size += size
+        else:
+            size = _stream_size(file.stream)
+            if size > max_file_size:
+                items.append((file.filename, None, 'File too large'))
+            else:
+                # Bound to the stream itself so detach_uploads() can swap it out of the FileStorage
+                items.append((file.filename, file.stream.read, None))
+                total_size += size
+        if len(items) > MAX_BATCH_FILES:
+            break
+        if total_size > MAX_BATCH_INFLATED_BYTES:
+            raise RequestEntityTooLarge(
+                f'Batch too large. Images may total at most {MAX_BATCH_INFLATED_BYTES // (1024 * 1024)}MB once unzipped.')
+    return items
+
+
+def detach_uploads(files):
+    """Keep uploaded files readable after the request ends; returns a function that closes them
+
+    Request teardown closes every uploaded file, but a streamed batch
+    response reads its images after that. Call after collect_images().
+    """
+    streams = [file.stream for file in files]
+    for file in files:
+        file.stream = io.BytesIO()
+
+    def close():
+        for stream in streams:
+            stream.close()
+
+    return close
+
+
+def _stream_size(stream):
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+
+def _zip_images(file, allowed_file, max_file_size):
+    try:
+        # Left open: members are read lazily while the batch is processed
+        archive = zipfile.ZipFile(file.stream)
+    except zipfile.BadZipFile as e:
+        logging.error("Error reading batch archive: %s", e)
+        yield file.filename, None, 'Invalid zip archive', 0
+        return
+
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    for info in members[:MAX_BATCH_FILES + 1]:
+        if not allowed_file(info.filename):
+            continue
+        # Check the declared size before inflating anything; reads never return more than it
+        if info.file_size > max_file_size:
+            yield info.filename, None, 'File too large', 0
+            continue
+        yield info.filename, lambda info=info: archive.read(info), None, info.file_size
+
+
+def read_image(reader, max_file_size):
+    """Read one collected item; returns (bytes, None) or (None, error)"""
+    try:
+        data = reader()
+    except (zipfile.BadZipFile, OSError) as e:
+        logging.error("Error reading batch image: %s", e)
+        return None, 'Could not read file'
+    if len(data) > max_file_size:
+        return None, 'File too large'
+    if sniff_format(data[:16]) is None:
+        return None, 'Invalid file type'
+    # Refuse decompression bombs from the header, as /predict does
+    try:
+        image_dimensions(io.BytesIO(data))
+    except ImageRejected as e:
+        return None, str(e)
+    return data, None
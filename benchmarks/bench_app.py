@@ -0,0 +1,70 @@
+"""Micro-benchmark: identify_plant and the chat handlers, as called by the routes
+
+Run from the repository root:
+
+    python benchmarks/bench_app.py [--sizes 640x480,4032x3024] [--formats JPEG,PNG,WEBP] [--iterations 30]
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import app as a gunicorn worker would, without warm-up or background threads skewing the timings
+os.environ.setdefault('FLORA_WORKER_HOOKS', '1')
+
+import app  # noqa: E402
+from bench_chat import SHORT_MESSAGES, make_messages  # noqa: E402
+from bench_ingest import make_upload  # noqa: E402
+from report import print_table, time_calls  # noqa: E402
+
+# Per-call log lines would dominate the timings being measured
+logging.getLogger().setLevel(logging.WARNING)
+
+
+def bench_identify(sizes, formats, iterations):
+    results = {}
+    for fmt in formats:
+        for spec in sizes:
+            width, height = (int(v) for v in spec.split('x'))
+            data = make_upload(width, height, fmt)
+            results[f'identify_plant/{fmt}/{spec}'] = time_calls(
+                lambda: app.identify_plant(io.BytesIO(data)), iterations)
+    return results
+
+
+def bench_chat(iterations, long_words=500):
+    results = {}
+    for length, messages in (('short', SHORT_MESSAGES), ('long', make_messages(long_words, count=10))):
+        cycle = {'index': 0}
+
+        def next_message():
+            cycle['index'] += 1
+            return messages[cycle['index'] % len(messages)]
+
+        results[f'is_botanical_question/{length}'] = time_calls(
+            lambda: app.is_botanical_question(next_message()), iterations * 10)
+        results[f'generate_botanical_response/{length}'] = time_calls(
+            lambda: app.generate_botanical_response(next_message()), iterations * 10)
+    return results
+
+
+def run(sizes='640x480,4032x3024', formats='JPEG,PNG,WEBP', iterations=30):
+    results = bench_identify(sizes.split(','), formats.split(','), iterations)
+    results.update(bench_chat(iterations))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='640x480,4032x3024')
+    parser.add_argument('--formats', default='JPEG,PNG,WEBP')
+    parser.add_argument('--iterations', type=int, default=30)
+    args = parser.parse_args()
+    print_table(run(args.sizes, args.formats, args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmark: single-pass chat routing vs. the repeated substring scans it replaced
+
+Run from the repository root:
+
+    python benchmarks/bench_chat.py [--lengths 10,50,200,5000] [--densities 0.05,0] [--repeat 5]
+
+Density is the share of words drawn from the keyword lists. At 0 no keyword
+matches, which is the worst case for the substring scans: every keyword of
+every group is searched for through the whole message.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_router import BOTANICAL_KEYWORDS, CARE_TOPICS, RESPONSE_INTENTS, chat_router  # noqa: E402
+
+FILLER = ('the my a is it and to of in for with on this that have be what how why when '
+          'please help thanks really some very about over kitchen window weekend').split()
+
+SHORT_MESSAGES = [
+    'How often should I water my succulent?',
+    'Why are the leaves on my fern turning brown?',
+    'What is the best soil for roses?',
+    'Tell me about photosynthesis',
+    'What time is the game tonight?',
+]
+
+
+def substring_route(message):
+    """Reference: the any(word in message_lower ...) scans the chat handlers used to run"""
+    message_lower = message.lower()
+    is_botanical = any(keyword in message_lower for keyword in BOTANICAL_KEYWORDS)
+    intent = next((name for name, words in RESPONSE_INTENTS
+                   if any(word in message_lower for word in words)), None)
+    if intent == 'care':
+        topic = next((name for name, words in CARE_TOPICS
+                      if any(word in message_lower for word in words)), None)
+        if topic:
+            intent = f'care_{topic}'
+    return is_botanical, intent
+
+
+def make_messages(words, count=50, seed=0, density=0.05):
+    """Mostly filler words with an occasional keyword, like real chat questions"""
+    rng = random.Random(seed)
+    vocabulary = [w for _, group in RESPONSE_INTENTS for w in group] + BOTANICAL_KEYWORDS
+    messages = []
+    for _ in range(count):
+        tokens = [rng.choice(vocabulary) if rng.random() < density else rng.choice(FILLER) for _ in range(words)]
+        messages.append(' '.join(tokens))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lengths', default='10,50,200,5000', help='message lengths in words')
+    parser.add_argument('--densities', default='0.05,0', help='share of words that are keywords')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'density':>8} {'words':>6} {'substring us':>13} {'router us':>10} {'speedup':>8} {'agree':>6}")
+    cases = [(float(d), int(n)) for d in args.densities.split(',') for n in args.lengths.split(',')]
+    for density, words in cases:
+        messages = make_messages(words, density=density)
+        agree = sum(substring_route(m) == chat_router.route(m) for m in messages) / len(messages)
+
+        def run(fn):
+            return min(timeit.repeat(lambda: [fn(m) for m in messages], number=1, repeat=args.repeat)) / len(messages)
+
+        old, new = run(substring_route), run(chat_router.route)
+        print(f"{density:>8.0%} {words:>6} {old * 1e6:>13.1f} {new * 1e6:>10.1f} {old / new:>7.1f}x {agree:>6.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Micro-benchmark: vectorized color features vs. the original per-pixel loop
+
+Run from the repository root:
+
+    python benchmarks/bench_features.py [--sizes 224,512,1024] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features import extract_color_features  # noqa: E402
+
+
+def loop_color_features(analysis_img):
+    """Reference implementation: the per-pixel loop identify_plant used to run"""
+    pixels = list(analysis_img.getdata())
+    green_pixels = red_pixels = blue_pixels = yellow_pixels = 0
+    total_pixels = len(pixels)
+
+    for r, g, b in pixels:
+        if g > r and g > b and g > 80:
+            green_pixels += 1
+        elif r > g and r > b and r > 100:
+            red_pixels += 1
+        elif r > 150 and g > 150 and b < 100:
+            yellow_pixels += 1
+        elif b > r and b > g and b > 80:
+            blue_pixels += 1
+
+    return {
+        'green_ratio': green_pixels / total_pixels,
+        'red_ratio': red_pixels / total_pixels,
+        'yellow_ratio': yellow_pixels / total_pixels,
+        'blue_ratio': blue_pixels / total_pixels,
+        'brightness': sum(r + g + b for r, g, b in pixels[:1000]) / (3000 * 255),
+    }
+
+
+def make_image(size, seed=0):
+    """Random RGB noise exercises every branch of the color classifier"""
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)
+    return Image.fromarray(data, 'RGB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='224,512,1024',
+                        help='comma-separated analysis sizes in pixels')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'loop ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        img = make_image(size)
+
+        if loop_color_features(img) != extract_color_features(img):
+            sys.exit(f"Feature mismatch at {size}px")
+
+        loop_s = min(timeit.repeat(lambda: loop_color_features(img), number=1, repeat=args.repeat))
+        vec_s = min(timeit.repeat(lambda: extract_color_features(img), number=1, repeat=args.repeat))
+        print(f"{size:>6} {loop_s * 1000:>10.2f} {vec_s * 1000:>10.2f} {loop_s / vec_s:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Micro-benchmark: full decode + resize vs. reduced-resolution ingest
+
+Run from the repository root:
+
+    python benchmarks/bench_ingest.py [--sizes 1024x768,4032x3024] [--repeat 5]
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+from features import ANALYSIS_SIZE  # noqa: E402
+
+
+def full_decode(data):
+    """Reference path: decode every pixel, then resize"""
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return img.resize(ANALYSIS_SIZE)
+
+
+def fast_decode(data):
+    return ingest.load_analysis_image(io.BytesIO(data))[0]
+
+
+def make_upload(width, height, fmt):
+    """Smooth gradients compress like photos, unlike random noise"""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    rgb = np.stack([np.broadcast_to(x, (height, width)),
+                    np.broadcast_to(y, (height, width)),
+                    (x + y) / 2], axis=-1).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(rgb, 'RGB').save(buf, fmt, **({'quality': 90} if fmt == 'JPEG' else {}))
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1024x768,4032x3024')
+    parser.add_argument('--formats', default='JPEG,PNG')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'format':>6} {'size':>10} {'full ms':>9} {'fast ms':>9} {'speedup':>8}")
+    for fmt in args.formats.split(','):
+        for spec in args.sizes.split(','):
+            width, height = (int(v) for v in spec.split('x'))
+            data = make_upload(width, height, fmt)
+            full_s = min(timeit.repeat(lambda: full_decode(data), number=1, repeat=args.repeat))
+            fast_s = min(timeit.repeat(lambda: fast_decode(data), number=1, repeat=args.repeat))
+            print(f"{fmt:>6} {spec:>10} {full_s * 1000:>9.1f} {fast_s * 1000:>9.1f} {full_s / fast_s:>7.1f}x")
+
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Micro-benchmark: species index lookup cost as the reference set grows
+
+Run from the repository root:
+
+    python benchmarks/bench_species_index.py [--sizes 1000,10000,50000] [--queries 256]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import species_index  # noqa: E402
+from features import FEATURE_VECTOR_SIZE  # noqa: E402
+
+
+def make_references(count, species=500, seed=0):
+    """Gaussian clusters around per-species prototypes"""
+    rng = np.random.default_rng(seed)
+    prototypes = rng.random((species, FEATURE_VECTOR_SIZE), dtype=np.float32)
+    labels = rng.integers(0, species, count)
+    vectors = prototypes[labels] + rng.normal(0, 0.03, (count, FEATURE_VECTOR_SIZE)).astype(np.float32)
+    return vectors, np.array([f"species-{i}" for i in labels]), prototypes
+
+
+def time_queries(index, queries, batch):
+    start = time.perf_counter()
+    if batch:
+        index.query(queries)
+    else:
+        for row in queries:
+            index.query(row)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    parser.add_argument('--queries', type=int, default=256)
+    args = parser.parse_args()
+
+    print(f"{'refs':>7} {'mode':>9} {'build s':>8} {'single us':>10} {'batch us':>9} {'recall':>7}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        vectors, labels, prototypes = make_references(size)
+        rng = np.random.default_rng(1)
+        queries = prototypes[rng.integers(0, len(prototypes), args.queries)]
+
+        exact = species_index.SpeciesIndex(vectors, labels, clusters=0)
+        start = time.perf_counter()
+        clustered = species_index.SpeciesIndex(vectors, labels, clusters=int(np.sqrt(size)))
+        build_s = time.perf_counter() - start
+
+        _, truth = exact.query(queries, k=1)
+        _, found = clustered.query(queries, k=1)
+        recall = np.all(exact.vectors[truth[:, 0]] == clustered.vectors[found[:, 0]], axis=1).mean()
+
+        for name, index, build in (('exact', exact, 0.0), ('clustered', clustered, build_s)):
+            single = time_queries(index, queries, batch=False)
+            batched = time_queries(index, queries, batch=True)
+            print(f"{size:>7} {name:>9} {build:>8.2f} {single * 1e6:>10.0f} {batched * 1e6:>9.0f}"
+                  f" {recall if name == 'clustered' else 1.0:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
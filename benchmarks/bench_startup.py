@@ -0,0 +1,80 @@
+"""Startup benchmark: cold-start time and per-worker memory with and without preloading
+
+Run from the repository root (Linux only, reads /proc):
+
+    python benchmarks/bench_startup.py [--workers 4]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from load_test import start_server  # noqa: E402
+from stub_wikipedia import start_stub  # noqa: E402
+
+
+def read_kb(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def worker_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def measure(preload, workers, wiki_url, port):
+    cache_dir = tempfile.mkdtemp(prefix='flora-bench-')
+    start = time.perf_counter()
+    server = start_server(port, workers, wiki_url, cache_dir, FLORA_PRELOAD='1' if preload else '0')
+    ready = time.perf_counter() - start
+    try:
+        # Let every worker finish booting before sampling memory
+        deadline = time.monotonic() + 30
+        while len(worker_pids(server.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        time.sleep(1)
+        pids = worker_pids(server.pid)
+        rss = [read_kb(f'/proc/{pid}/status', 'VmRSS:') / 1024 for pid in pids]
+        pss = [read_kb(f'/proc/{pid}/smaps_rollup', 'Pss:') / 1024 for pid in pids]
+        return {
+            'ready_s': ready,
+            'workers': len(pids),
+            'rss_mb': sum(rss) / len(rss),
+            'pss_mb': sum(pss) / len(pss),
+            'total_pss_mb': sum(pss),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=18001)
+    args = parser.parse_args()
+
+    stub = start_stub()
+    wiki_url = f'http://127.0.0.1:{stub.server_address[1]}'
+    print(f"{'preload':>8} {'ready s':>8} {'workers':>8} {'RSS MB':>8} {'PSS MB':>8} {'total PSS':>10}")
+    for preload in (False, True):
+        result = measure(preload, args.workers, wiki_url, args.port)
+        print(f"{str(preload):>8} {result['ready_s']:>8.2f} {result['workers']:>8} {result['rss_mb']:>8.1f} "
+              f"{result['pss_mb']:>8.1f} {result['total_pss_mb']:>10.1f}")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
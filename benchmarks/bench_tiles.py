@@ -0,0 +1,86 @@
+"""Benchmark: single-frame vs tiled analysis on large and animated images
+
+Run from the repository root (Linux/macOS, forks one process per case):
+
+    python benchmarks/bench_tiles.py [--sizes 8000x2000,6000x6000] [--frames 60] [--repeat 3]
+
+Each case runs in a forked child so its peak RSS growth is measured on its own.
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import timeit
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest  # noqa: E402
+from bench_ingest import make_upload  # noqa: E402
+
+
+def make_animation(width, height, frames, fmt):
+    """Frames that shift hue over time, so sampled frames differ from frame 0"""
+    rng = np.random.default_rng(0)
+    images = []
+    for index in range(frames):
+        rgb = np.empty((height, width, 3), dtype=np.uint8)
+        rgb[...] = (index * 4 % 256, 140, 255 - index * 4 % 256)
+        rgb[rng.integers(0, height, 64), rng.integers(0, width, 64)] = (250, 220, 40)
+        images.append(Image.fromarray(rgb, 'RGB'))
+    buf = io.BytesIO()
+    images[0].save(buf, fmt, save_all=True, append_images=images[1:], duration=40, loop=0)
+    return buf.getvalue()
+
+
+def measure(data, tiled, repeat):
+    """Best time in ms and peak RSS growth in MB, measured in a forked child"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        seconds = min(timeit.repeat(lambda: ingest.load_analysis(io.BytesIO(data), tiled=tiled),
+                                    number=1, repeat=repeat))
+        growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+        os.write(write_fd, f'{seconds} {growth}'.encode())
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        seconds, growth = f.read().split()
+    os.waitpid(pid, 0)
+    return float(seconds) * 1000, int(growth) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='8000x2000,6000x6000', help='still images, JPEG and PNG')
+    parser.add_argument('--animation-size', default='640x480')
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = []
+    for spec in args.sizes.split(','):
+        width, height = (int(v) for v in spec.split('x'))
+        for fmt in ('JPEG', 'PNG'):
+            cases.append((fmt, spec, make_upload(width, height, fmt)))
+    width, height = (int(v) for v in args.animation_size.split('x'))
+    for fmt in ('GIF', 'WEBP'):
+        cases.append((fmt, f'{args.animation_size}x{args.frames}',
+                      make_animation(width, height, args.frames, fmt)))
+
+    print(f"frames {ingest.ANALYSIS_MAX_FRAMES}/{ingest.ANALYSIS_FRAME_WINDOW}, "
+          f"tiles {ingest.ANALYSIS_MAX_TILES} x {ingest.ANALYSIS_TILE_SIZE}px")
+    print(f"{'format':>6} {'input':>14} {'single ms':>10} {'tiled ms':>9} {'single MB':>10} {'tiled MB':>9}")
+    for fmt, spec, data in cases:
+        single_ms, single_mb = measure(data, False, args.repeat)
+        tiled_ms, tiled_mb = measure(data, True, args.repeat)
+        print(f"{fmt:>6} {spec:>14} {single_ms:>10.1f} {tiled_ms:>9.1f} {single_mb:>10.1f} {tiled_mb:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""End-to-end load test: the app under gunicorn, backed by the stub Wikipedia server
+
+Run from the repository root:
+
+    python benchmarks/load_test.py [--workers 2] [--concurrency 8] [--requests 200] [--scenarios predict,chat]
+
+Each run starts gunicorn with a fresh cache directory, so the first request
+for each plant misses the Wikipedia cache exactly as in production.
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_chat import SHORT_MESSAGES  # noqa: E402
+from bench_ingest import make_upload  # noqa: E402
+from report import print_table, summarize  # noqa: E402
+from stub_wikipedia import start_stub  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(port, workers, wiki_url, cache_dir, **extra_env):
+    env = dict(os.environ, WIKIPEDIA_BASE_URL=wiki_url, FLORA_CACHE_DIR=cache_dir, **extra_env)
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+               '--access-logfile', '/dev/null', 'app:app']
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit('gunicorn exited during startup')
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).ok:
+                return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit('gunicorn did not become healthy within 30s')
+
+
+def predict_requests(base_url, distinct_images):
+    """Callables posting one of distinct_images generated photos to /predict"""
+    rng = random.Random(0)
+    uploads = [make_upload(rng.randint(480, 1600), rng.randint(480, 1200), 'JPEG') for _ in range(distinct_images)]
+
+    def call(index):
+        files = {'image': (f'{index}.jpg', uploads[index % len(uploads)], 'image/jpeg')}
+        return requests.post(f'{base_url}/predict', files=files, timeout=60)
+
+    return call
+
+
+def chat_requests(base_url):
+    def call(index):
+        return requests.post(f'{base_url}/chat', json={'message': SHORT_MESSAGES[index % len(SHORT_MESSAGES)]},
+                             timeout=60)
+
+    return call
+
+
+def drive(call, total, concurrency):
+    """Issue total calls from concurrency threads; the summary includes failed requests as errors"""
+    def timed(index):
+        start = time.perf_counter()
+        try:
+            ok = call(index).ok
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+    summary = summarize([duration for duration, _ in outcomes], elapsed)
+    summary['errors'] = sum(not ok for _, ok in outcomes)
+    return summary
+
+
+def run(workers=2, concurrency=8, total=200, scenarios='predict,chat', distinct_images=20,
+        wiki_latency_ms=50, port=18000):
+    stub = start_stub(latency=wiki_latency_ms / 1000)
+    wiki_url = f'http://127.0.0.1:{stub.server_address[1]}'
+    cache_dir = tempfile.mkdtemp(prefix='flora-bench-')
+    server = start_server(port, workers, wiki_url, cache_dir)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        results = {}
+        for scenario in scenarios.split(','):
+            call = predict_requests(base_url, distinct_images) if scenario == 'predict' else chat_requests(base_url)
+            results[f'load/{scenario}/c{concurrency}'] = drive(call, total, concurrency)
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        stub.shutdown()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--scenarios', default='predict,chat')
+    parser.add_argument('--distinct-images', type=int, default=20,
+                        help='images to rotate through; fewer means more result-cache hits')
+    parser.add_argument('--wiki-latency-ms', type=float, default=50)
+    parser.add_argument('--port', type=int, default=18000)
+    args = parser.parse_args()
+
+    results = run(args.workers, args.concurrency, args.requests, args.scenarios,
+                  args.distinct_images, args.wiki_latency_ms, args.port)
+    print_table(results)
+    for name, summary in results.items():
+        if summary['errors']:
+            print(f"{name}: {summary['errors']} failed requests")
+
+
+if __name__ == '__main__':
+    main()
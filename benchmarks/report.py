@@ -0,0 +1,78 @@
+"""Latency summaries and baseline comparison shared by the benchmark scripts"""
+import json
+import time
+
+# Summary fields compared against the baseline; latency may grow, throughput may shrink, by the tolerance
+LATENCY_FIELDS = ('p50_ms', 'p95_ms')
+THROUGHPUT_FIELD = 'throughput_rps'
+
+
+def percentile(sorted_samples, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples, elapsed=None):
+    """Throughput and p50/p95/p99 latency of per-call durations in seconds
+
+    elapsed is the wall-clock time of the whole run; it defaults to the sum of
+    the samples, which is right for calls made one after another.
+    """
+    ordered = sorted(samples)
+    elapsed = elapsed if elapsed is not None else sum(ordered)
+    return {
+        'count': len(ordered),
+        THROUGHPUT_FIELD: round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def time_calls(fn, iterations, warmup=3):
+    """Call fn() iterations times after a short warmup and summarize the durations"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def print_table(results):
+    print(f"{'case':<40} {'count':>6} {'rps':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, summary in results.items():
+        print(f"{name:<40} {summary['count']:>6} {summary[THROUGHPUT_FIELD]:>10.1f} "
+              f"{summary['p50_ms']:>9.3f} {summary['p95_ms']:>9.3f} {summary['p99_ms']:>9.3f}")
+
+
+def compare(results, baseline, tolerance):
+    """Return one message per case that regressed by more than tolerance (0.2 = 20%)"""
+    regressions = []
+    for name, summary in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for field in LATENCY_FIELDS:
+            if reference.get(field) and summary[field] > reference[field] * (1 + tolerance):
+                regressions.append(f"{name}: {field} {summary[field]} > baseline {reference[field]}")
+        if reference.get(THROUGHPUT_FIELD) and summary[THROUGHPUT_FIELD] < reference[THROUGHPUT_FIELD] / (1 + tolerance):
+            regressions.append(f"{name}: {THROUGHPUT_FIELD} {summary[THROUGHPUT_FIELD]} < "
+                               f"baseline {reference[THROUGHPUT_FIELD]}")
+    return regressions
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,60 @@
+"""Run the benchmark suite and compare it against a stored baseline
+
+Run from the repository root:
+
+    python benchmarks/run.py [--load] [--output results.json] [--tolerance 0.25]
+    python benchmarks/run.py --save-baseline     # after an intended change
+
+Exits with status 1 when any case is slower than the baseline by more than
+the tolerance. Baselines are machine-specific; regenerate baseline.json on
+the machine that runs the comparison.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_app  # noqa: E402
+from report import compare, load_json, print_table, save_json  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--load', action='store_true', help='also run the gunicorn load test')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args()
+
+    results = bench_app.run(iterations=args.iterations)
+    if args.load:
+        import load_test
+        results.update(load_test.run(concurrency=args.concurrency))
+    print_table(results)
+
+    if args.output:
+        save_json(args.output, results)
+    if args.save_baseline:
+        save_json(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    regressions = compare(results, load_json(args.baseline), args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
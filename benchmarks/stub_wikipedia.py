@@ -0,0 +1,94 @@
+"""Local stand-in for the Wikipedia summary APIs, for load tests without network access
+
+Run from the repository root:
+
+    python benchmarks/stub_wikipedia.py [--port 8765] [--latency-ms 50]
+
+then start the app with WIKIPEDIA_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class StubWikipedia(ThreadingHTTPServer):
+    """Local Wikipedia with per-endpoint latency, REST misses and a request log
+
+    Shared with the test suite's stub_wikipedia fixture.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.base_url = f'http://127.0.0.1:{self.server_address[1]}'
+        self.rest_latency = 0.0
+        self.query_latency = 0.0
+        self.rest_missing = set()
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def paths(self, prefix=''):
+        with self.lock:
+            return [path for path in self.requests if path.startswith(prefix)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stub = self.server
+        url = urlparse(self.path)
+        with stub.lock:
+            stub.requests.append(url.path)
+        if url.path.startswith('/api/rest_v1/page/summary/'):
+            time.sleep(stub.rest_latency)
+            title = unquote(url.path.rsplit('/', 1)[1]).replace('_', ' ')
+            if title in stub.rest_missing:
+                self.send_error(404)
+                return
+            body = {'title': title, 'extract': f'REST summary of {title}.'}
+        elif url.path == '/w/api.php':
+            time.sleep(stub.query_latency)
+            title = parse_qs(url.query).get('titles', [''])[0]
+            extract = f'Query extract of {title}, long enough to be used as the plant description.'
+            body = {'query': {'pages': {'1': {'title': title, 'extract': extract}}}}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency=0.0):
+    """Serve the stub on a background thread with latency on both endpoints; returns the server"""
+    server = StubWikipedia(port)
+    server.rest_latency = server.query_latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    server = start_stub(args.port, args.latency_ms / 1000)
+    print(f"Stub Wikipedia listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import json
+import operator
+import os
+from collections import namedtuple
+
+CATALOG_PATH = os.environ.get(
+    'FLORA_CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'catalog.json'))
+
+# Rule features map onto the keys produced by features.extract_color_features
+RULE_FEATURES = {
+    'green': 'green_ratio',
+    'red': 'red_ratio',
+    'yellow': 'yellow_ratio',
+    'blue': 'blue_ratio',
+    'brightness': 'brightness',
+}
+
+RULE_OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+}
+
+Species = namedtuple('Species', ['name', 'description', 'category', 'care_tips', 'wiki_url'])
+Category = namedtuple('Category', ['name', 'matches', 'species'])
+
+
+def compile_rule(rule):
+    """Compile a catalog rule into a predicate over a color feature dict
+
+    A rule is either a condition string such as "green > 0.4", a mapping
+    {"all": [...]} / {"any": [...]} of nested rules, or null (always true).
+    """
+    if rule is None:
+        return lambda features: True
+
+    if isinstance(rule, str):
+        name, op, value = rule.split()
+        key, compare, threshold = RULE_FEATURES[name], RULE_OPERATORS[op], float(value)
+        return lambda features: compare(features[key], threshold)
+
+    (combinator, rules), = rule.items()
+    predicates = tuple(compile_rule(r) for r in rules)
+    if combinator == 'all':
+        return lambda features: all(p(features) for p in predicates)
+    if combinator == 'any':
+        return lambda features: any(p(features) for p in predicates)
+    raise ValueError(f"Unknown catalog rule combinator: {combinator}")
+
+
+def wiki_url_for(plant_name):
+    """Wikipedia article URL for a plant name"""
+    return f"https://en.wikipedia.org/wiki/{plant_name.replace(' ', '_')}"
+
+
+class Catalog:
+    """Species, category rules and care tips, compiled once from a data file"""
+
+    def __init__(self, data):
+        self.care_tip_rules = [
+            (tuple(entry['keywords']), tuple(entry['tips'])) for entry in data['care_tips']
+        ]
+        self.species_by_name = {}
+
+        # Categories are listed in priority order; the first match wins
+        self.categories = tuple(
+            Category(entry['name'], compile_rule(entry['rule']),
+                     self._add_species(entry['species'], entry['name']))
+            for entry in data['categories']
+        )
+        self.fallbacks = tuple(
+            (compile_rule(entry['rule']), self._add_species(entry['species'], 'fallback'))
+            for entry in data['fallbacks']
+        )
+        self.error_fallback = self._add_species(data['error_fallback'], 'error_fallback')
+
+    def _add_species(self, entries, category):
+        species = tuple(
+            Species(entry['name'], entry['description'], category,
+                    self._match_care_tips(entry['name']), wiki_url_for(entry['name']))
+            for entry in entries
+        )
+        for s in species:
+            self.species_by_name.setdefault(s.name, s)
+        return species
+
+    def _match_care_tips(self, plant_name):
+        plant_lower = plant_name.lower()
+        for keywords, tips in self.care_tip_rules:
+            if not keywords or any(word in plant_lower for word in keywords):
+                return tips
+        return ()
+
+    def match_category(self, features):
+        """Return the highest-priority matching category and the number of matches"""
+        selected = None
+        match_count = 0
+        for category in self.categories:
+            if category.matches(features):
+                match_count += 1
+                if selected is None:
+                    selected = category
+        return selected, match_count
+
+    def fallback_species(self, features):
+        """Species to choose from when no category matches"""
+        for matches, species in self.fallbacks:
+            if matches(features):
+                return species
+        return self.fallbacks[-1][1]
+
+    def care_tips(self, plant_name):
+        """Care tips for a plant, precomputed for catalog species"""
+        species = self.species_by_name.get(plant_name)
+        if species is not None:
+            return species.care_tips
+        return self._match_care_tips(plant_name)
+
+    def wiki_url(self, plant_name):
+        """Wikipedia URL for a plant, precomputed for catalog species"""
+        species = self.species_by_name.get(plant_name)
+        if species is not None:
+            return species.wiki_url
+        return wiki_url_for(plant_name)
+
+
+def load_catalog(path=CATALOG_PATH):
+    """Load and compile the plant catalog from a JSON data file"""
+    with open(path, encoding='utf-8') as f:
+        return Catalog(json.load(f))
+
+
+catalog = load_catalog()
@@ -0,0 +1,134 @@
+import re
+
+BOTANICAL_KEYWORDS = [
+    'plant', 'flower', 'tree', 'leaf', 'leaves', 'garden', 'gardening', 'botany', 'botanical',
+    'grow', 'growing', 'care', 'water', 'watering', 'soil', 'fertilizer', 'pruning', 'propagate',
+    'succulent', 'cactus', 'herb', 'vegetable', 'fruit', 'seed', 'seeds', 'bloom', 'blooming',
+    'houseplant', 'indoor', 'outdoor', 'photosynthesis', 'chlorophyll', 'roots', 'stem', 'stems',
+    'petal', 'petals', 'pollen', 'pollination', 'species', 'variety', 'cultivar', 'hybrid',
+    'perennial', 'annual', 'biennial', 'evergreen', 'deciduous', 'tropical', 'temperate',
+    'light', 'sunlight', 'shade', 'humidity', 'temperature', 'climate', 'season', 'seasonal',
+    'repot', 'repotting', 'transplant', 'mulch', 'compost', 'organic', 'disease', 'pest',
+    'fungus', 'bacteria', 'virus', 'nutrient', 'nitrogen', 'phosphorus', 'potassium',
+    'photosynthesis', 'respiration', 'transpiration', 'germination', 'phototropism'
+]
+
+# Response intents in priority order; the first one with a matching keyword wins
+RESPONSE_INTENTS = [
+    ('care', ['care', 'how to', 'growing', 'grow']),
+    ('identification', ['identify', 'what is', 'what plant', 'name', 'species']),
+    ('watering', ['water', 'watering', 'irrigation']),
+    ('light', ['light', 'sun', 'shade', 'photosynthesis']),
+    ('soil', ['soil', 'potting', 'drainage', 'nutrients']),
+    ('fertilizer', ['fertilizer', 'fertilize', 'feed', 'nutrients', 'nitrogen']),
+    ('propagation', ['propagate', 'propagation', 'cutting', 'cuttings', 'seeds']),
+    ('problems', ['problem', 'disease', 'pest', 'dying', 'yellow', 'brown', 'sick']),
+    ('seasonal', ['winter', 'summer', 'spring', 'fall', 'season', 'dormancy']),
+    ('biology', ['photosynthesis', 'chlorophyll', 'leaves', 'biology']),
+    ('hormones', ['hormone', 'growth', 'pruning', 'pinching']),
+    ('air', ['air', 'purify', 'clean', 'oxygen', 'pollution']),
+    ('taxonomy', ['family', 'taxonomy', 'classification']),
+]
+
+# Plant groups that refine the 'care' intent, in priority order
+CARE_TOPICS = [
+    ('succulents', ['succulent', 'cactus', 'desert']),
+    ('roses', ['rose', 'roses']),
+    ('orchids', ['orchid', 'orchids']),
+    ('ferns', ['fern', 'ferns']),
+]
+
+
+def _trie_pattern(words):
+    """Regex alternation factored into a prefix trie, longest match first"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional: prefer the longer keyword, fall back to this one
+        return '(?:' + body + ')?' if terminal else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Matcher for several named keyword groups, compiled once into one regex
+
+    Keywords match at the start of a word and may continue into a longer
+    word ("plant" matches "plants" and "planting" but not "implant").
+
+    All keywords form a single trie-shaped alternation, so a text is scanned
+    once however many keywords there are. Each word start yields its longest
+    keyword, which also credits every keyword it starts with and any keyword
+    starting at a later word inside it ("what plant" credits "plant").
+    """
+
+    def __init__(self, groups):
+        self.bits = {}
+        keyword_masks = {}
+        for bit, (name, keywords) in enumerate(groups):
+            self.bits[name] = 1 << bit
+            for keyword in keywords:
+                keyword_masks[keyword] = keyword_masks.get(keyword, 0) | (1 << bit)
+
+        self._masks = {}
+        for keyword in keyword_masks:
+            word_starts = [0] + [match.start() for match in re.finditer(r'(?<!\w)\w', keyword)][1:]
+            mask = 0
+            for other, other_mask in keyword_masks.items():
+                if any(keyword.startswith(other, start) for start in word_starts):
+                    mask |= other_mask
+            self._masks[keyword] = mask
+
+        self._pattern = re.compile(r'(?<!\w)(' + _trie_pattern(keyword_masks) + ')')
+
+    def match_mask(self, text, until=0):
+        """Bitmask of groups with at least one keyword in text (already lowercased)
+
+        The scan stops as soon as every group bit in until has matched.
+        """
+        mask = 0
+        masks = self._masks
+        for match in self._pattern.finditer(text):
+            mask |= masks[match.group(1)]
+            if until and mask & until == until:
+                break
+        return mask
+
+
+class ChatRouter:
+    """Classify a chat message and pick its response intent"""
+
+    def __init__(self, botanical_keywords=BOTANICAL_KEYWORDS, intents=RESPONSE_INTENTS, care_topics=CARE_TOPICS):
+        self.matcher = KeywordMatcher([('botanical', botanical_keywords)] + list(intents) + list(care_topics))
+        bits = self.matcher.bits
+        self._intents = [(name, bits[name]) for name, _ in intents]
+        self._care_topics = [(name, bits[name]) for name, _ in care_topics]
+        # Once the text is botanical and has matched the top intent and top
+        # care topic, nothing later in it can change the route
+        self._settled = bits['botanical'] | self._intents[0][1] | self._care_topics[0][1]
+
+    def route(self, message):
+        """Return (is_botanical, intent); intent is None when no intent keyword matched
+
+        Care questions about a specific plant group route to 'care_<topic>'.
+        """
+        mask = self.matcher.match_mask(message.lower(), self._settled)
+        intent = next((name for name, bit in self._intents if mask & bit), None)
+        if intent == 'care':
+            topic = next((name for name, bit in self._care_topics if mask & bit), None)
+            if topic:
+                intent = f'care_{topic}'
+        return bool(mask & self.matcher.bits['botanical']), intent
+
+
+chat_router = ChatRouter()
@@ -0,0 +1,127 @@
+import math
+
+import numpy as np
+
+# Standard size for analysis
+ANALYSIS_SIZE = (224, 224)
+
+# Number of leading pixels sampled for the brightness estimate
+BRIGHTNESS_SAMPLE = 1000
+
+# Histogram bins for the hue, saturation and value channels of the feature vector
+HUE_BINS = 12
+SATURATION_BINS = 4
+VALUE_BINS = 4
+
+FEATURE_VECTOR_SIZE = HUE_BINS + SATURATION_BINS + VALUE_BINS + 2
+
+# Steps per unit that color ratios and brightness are rounded to in the perceptual cache key
+COLOR_SIGNATURE_LEVELS = 20
+
+
+def color_counts(pixels):
+    """Count green, red, yellow and blue pixels in an (..., 3) uint8 array
+
+    The masks mirror the original per-pixel if/elif chain, so each pixel is
+    counted in at most one bucket and earlier buckets take precedence.
+    """
+    r = pixels[..., 0]
+    g = pixels[..., 1]
+    b = pixels[..., 2]
+
+    # Green (chlorophyll)
+    green = (g > r) & (g > b) & (g > 80)
+    remaining = ~green
+    # Red (flowers, autumn leaves)
+    red = remaining & (r > g) & (r > b) & (r > 100)
+    remaining &= ~red
+    # Yellow (flowers, dying leaves)
+    yellow = remaining & (r > 150) & (g > 150) & (b < 100)
+    remaining &= ~yellow
+    # Blue (rare in plants, some flowers)
+    blue = remaining & (b > r) & (b > g) & (b > 80)
+
+    return (int(np.count_nonzero(green)), int(np.count_nonzero(red)),
+            int(np.count_nonzero(yellow)), int(np.count_nonzero(blue)))
+
+
+def tile_grid(width, height, max_tiles):
+    """(columns, rows) of square tiles that follow the image's aspect ratio within max_tiles"""
+    aspect = width / height
+    rows = max(1, min(max_tiles, round(math.sqrt(max_tiles / aspect))))
+    columns = max(1, min(max_tiles // rows, round(rows * aspect)))
+    return columns, rows
+
+
+def extract_color_features(analysis_img):
+    """Compute color ratios and brightness for an RGB analysis image"""
+    pixels = np.asarray(analysis_img, dtype=np.uint8)
+    total_pixels = pixels.shape[0] * pixels.shape[1]
+
+    green, red, yellow, blue = color_counts(pixels)
+
+    # Brightness of the first pixels in row-major order, as getdata() yields them
+    sample = pixels.reshape(-1, 3)[:BRIGHTNESS_SAMPLE]
+    brightness = int(sample.sum(dtype=np.int64)) / (3 * BRIGHTNESS_SAMPLE * 255)
+
+    return {
+        'green_ratio': green / total_pixels,
+        'red_ratio': red / total_pixels,
+        'yellow_ratio': yellow / total_pixels,
+        'blue_ratio': blue / total_pixels,
+        'brightness': brightness,
+    }
+
+
+def _histogram(channel, bins):
+    counts = np.bincount((channel.astype(np.uint16) * bins >> 8).ravel(), minlength=bins)
+    return counts / channel.size
+
+
+def feature_vector(analysis_img, original_size):
+    """Fixed-length descriptor: HSV histograms, brightness and aspect ratio
+
+    Every component is scaled to roughly [0, 1] so Euclidean distance
+    weighs color composition and shape comparably.
+    """
+    hsv = np.asarray(analysis_img.convert('HSV'), dtype=np.uint8)
+    width, height = original_size
+
+    brightness = hsv[..., 2].mean() / 255
+    # log2 aspect ratio clipped to 4:1 either way, mapped onto [0, 1]
+    aspect = (np.clip(np.log2(width / height), -2, 2) + 2) / 4
+
+    return np.concatenate([
+        _histogram(hsv[..., 0], HUE_BINS),
+        _histogram(hsv[..., 1], SATURATION_BINS),
+        _histogram(hsv[..., 2], VALUE_BINS),
+        [brightness, aspect],
+    ]).astype(np.float32)
+
+
+def difference_hash(analysis_img, hash_size=8):
+    """64-bit dHash: brightness gradients of a tiny grayscale thumbnail
+
+    Re-encoded or resized copies of a photo produce the same hash.
+    """
+    thumb = np.asarray(analysis_img.convert('L').resize((hash_size + 1, hash_size)), dtype=np.int16)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def color_signature(color_features, levels=COLOR_SIGNATURE_LEVELS):
+    """Color ratios and brightness rounded to 1/levels steps"""
+    return tuple(round(color_features[key] * levels)
+                 for key in ('green_ratio', 'red_ratio', 'yellow_ratio', 'blue_ratio', 'brightness'))
+
+
+def perceptual_cache_key(analysis_img, color_features=None):
+    """Result cache key shared by visually identical images
+
+    dHash only sees luminance structure, so the same gradient in green and in
+    red hash alike; the color signature keeps images the color classifier
+    would tell apart on separate keys.
+    """
+    if color_features is None:
+        color_features = extract_color_features(analysis_img)
+    return difference_hash(analysis_img), color_signature(color_features)
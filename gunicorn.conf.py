@@ -1,5 +1,10 @@
 # Gunicorn configuration file
+import gc
 import multiprocessing
+import os
+import time
+
+CONFIG_LOADED_AT = time.monotonic()
 
 # Server socket
 bind = "0.0.0.0:10000"
@@ -12,14 +17,22 @@ worker_connections = 1000
 timeout = 30
 keepalive = 2
 
-# Logging
-accesslog = '-'
+# Logging: the app writes one structured record per request, so gunicorn's
+# access log is off unless ACCESS_LOG is set (e.g. ACCESS_LOG=- for stdout)
+accesslog = os.environ.get('ACCESS_LOG') or None
 errorlog = '-'
-loglevel = 'info'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
 
 # Process naming
 proc_name = 'floratracker'
 
+# Warm start: import the app and build its shared state once in the master,
+# then fork workers that share it copy-on-write (FLORA_PRELOAD=0 to disable)
+preload_app = os.environ.get('FLORA_PRELOAD', '1') == '1'
+
+# app.py leaves warm-up and background services to the hooks below
+os.environ['FLORA_WORKER_HOOKS'] = '1'
+
 # Server mechanics
 daemon = False
 pidfile = None
@@ -30,4 +43,34 @@ tmp_upload_dir = None
 
 # SSL
 keyfile = None
-certfile = None 
\ No newline at end of file
+certfile = None
+
+def on_starting(server):
+    """Drop metrics files left by a previous run of the server"""
+    from metrics import metrics
+    metrics.clear()
+
+def worker_exit(server, worker):
+    """Write the exiting worker's last totals before child_exit folds its file"""
+    from metrics import metrics
+    metrics.flush()
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics into the retired totals"""
+    from metrics import metrics
+    metrics.retire({worker.pid})
+
+def when_ready(server):
+    """Warm up in the master and freeze the heap so workers keep sharing its pages"""
+    if preload_app:
+        import app
+        app.warm_up()
+        gc.freeze()
+    server.log.info("Master ready %.2fs after loading the config", time.monotonic() - CONFIG_LOADED_AT)
+
+def post_fork(server, worker):
+    """Warm up unless the master already did, and start per-worker background services"""
+    import app
+    if not app.readiness['warm']:
+        app.warm_up()
+    app.start_worker()
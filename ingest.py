@@ -0,0 +1,259 @@
+import hashlib
+import io
+import os
+import tempfile
+
+import numpy as np
+from flask import Request, current_app
+from PIL import Image
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from features import ANALYSIS_SIZE, color_counts, extract_color_features, tile_grid
+
+# Write uploads to UPLOAD_FOLDER before analysis instead of decoding in memory
+SPOOL_UPLOADS = os.environ.get('FLORA_SPOOL_UPLOADS', '0') == '1'
+
+# Spooled uploads stay in memory up to this many bytes, like werkzeug's default stream
+SPOOL_MAX_MEMORY = 500 * 1024
+
+# Decode at reduced resolution (JPEG draft mode, integer reduce before resampling)
+FAST_DECODE = os.environ.get('FLORA_FAST_DECODE', '1') == '1'
+
+# Final resampling step never shrinks by less than this factor after reduce()
+REDUCING_GAP = 3.0
+
+# Compute color ratios over sampled frames and undistorted tiles instead of one squashed frame.
+# Off by default: it shifts the ratios the color rules and the catalog were tuned against
+ANALYSIS_TILED = os.environ.get('ANALYSIS_TILED', '0') == '1'
+
+# Frames sampled from animated images, spread evenly over the first ANALYSIS_FRAME_WINDOW
+# frames; seeking in GIF and WebP decodes every frame before the target, so the window caps the cost
+ANALYSIS_MAX_FRAMES = int(os.environ.get('ANALYSIS_MAX_FRAMES', 3))
+ANALYSIS_FRAME_WINDOW = int(os.environ.get('ANALYSIS_FRAME_WINDOW', 8))
+
+# Square tiles per frame and their edge in pixels; bounds the pixels examined per frame
+ANALYSIS_MAX_TILES = int(os.environ.get('ANALYSIS_MAX_TILES', 16))
+ANALYSIS_TILE_SIZE = int(os.environ.get('ANALYSIS_TILE_SIZE', 56))
+
+# Images with more pixels than this are rejected from their header, before decoding
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 50_000_000))
+
+# Pillow raises DecompressionBombError itself past twice this limit
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Leading bytes of each accepted format
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+
+_UNSET = object()
+
+
+class ImageRejected(ValueError):
+    """Raised when an upload is not an image we can safely decode"""
+
+
+class HashingBuffer(io.BytesIO):
+    """In-memory upload buffer that hashes the bytes as the form parser writes them
+
+    Writing past limit bytes raises RequestEntityTooLarge, which aborts parsing
+    of the rest of the body.
+    """
+
+    def __init__(self, limit=None):
+        super().__init__()
+        self._hash = hashlib.blake2b(digest_size=16)
+        self.limit = limit
+
+    def write(self, data):
+        if self.limit is not None and self.tell() + len(data) > self.limit:
+            raise RequestEntityTooLarge()
+        self._hash.update(data)
+        return super().write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """HashingBuffer counterpart for FLORA_SPOOL_UPLOADS=1 that rolls over to a temp file"""
+
+    def __init__(self, limit=None):
+        super().__init__(max_size=SPOOL_MAX_MEMORY, mode='rb+')
+        self._hash = hashlib.blake2b(digest_size=16)
+        self.limit = limit
+
+    def write(self, data):
+        if self.limit is not None and self.tell() + len(data) > self.limit:
+            raise RequestEntityTooLarge()
+        self._hash.update(data)
+        return super().write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class UploadRequest(Request):
+    """Request that keeps uploaded files in memory instead of a temp file
+
+    With FLORA_SPOOL_UPLOADS=1 they are spooled to a temp file instead; either
+    way max_file_size is enforced while the form is parsed.
+    """
+
+    _max_file_size = _UNSET
+
+    @property
+    def max_file_size(self):
+        """Largest single uploaded file in bytes, None for no limit
+
+        Defaults to the MAX_FILE_SIZE config and can be overridden per request.
+        """
+        if self._max_file_size is not _UNSET:
+            return self._max_file_size
+        return current_app.config.get('MAX_FILE_SIZE') if current_app else None
+
+    @max_file_size.setter
+    def max_file_size(self, value):
+        self._max_file_size = value
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        limit = self.max_file_size
+        if limit is not None and content_length is not None and content_length > limit:
+            raise RequestEntityTooLarge()
+        if SPOOL_UPLOADS:
+            return HashingSpooledFile(limit)
+        return HashingBuffer(limit)
+
+
+def bytes_digest(data):
+    """Content hash of raw image bytes, matching what HashingBuffer computes"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def upload_digest(file):
+    """Content hash of an uploaded file, computed during parsing when possible"""
+    stream = file.stream
+    if isinstance(stream, (HashingBuffer, HashingSpooledFile)):
+        return stream.hexdigest()
+
+    digest = hashlib.blake2b(digest_size=16)
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def sniff_format(head):
+    """Image format named by the leading bytes of a file, or None if not accepted"""
+    for signature, image_format in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def sniff_stream(stream):
+    """sniff_format() for a seekable file object, left rewound"""
+    stream.seek(0)
+    head = stream.read(16)
+    stream.seek(0)
+    return sniff_format(head)
+
+
+def _check_pixels(size):
+    width, height = size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageRejected(f'Image dimensions {width}x{height} are too large')
+
+
+def image_dimensions(stream):
+    """Read (width, height) from the image header without decoding pixels
+
+    Raises ImageRejected for unreadable images and ones over MAX_IMAGE_PIXELS.
+    """
+    stream.seek(0)
+    try:
+        with Image.open(stream) as img:
+            size = img.size
+    except Image.DecompressionBombError as e:
+        raise ImageRejected(str(e)) from e
+    except OSError as e:
+        raise ImageRejected(f'Unreadable image: {e}') from e
+    finally:
+        stream.seek(0)
+    _check_pixels(size)
+    return size
+
+
+def _frame_indices(frame_count):
+    """Evenly spaced frame numbers within the frame budget, always including frame 0"""
+    window = min(frame_count, ANALYSIS_FRAME_WINDOW)
+    count = max(1, min(window, ANALYSIS_MAX_FRAMES))
+    return sorted({index * window // count for index in range(count)})
+
+
+def load_analysis(source, size=ANALYSIS_SIZE, tiled=ANALYSIS_TILED):
+    """Decode an image path or file object for classification
+
+    Returns (analysis_img, original_size, color_features). analysis_img is
+    frame 0 resized to analysis size. In tiled mode color_features holds
+    green/red/yellow/blue ratios accumulated over up to ANALYSIS_MAX_FRAMES
+    frames, each resized without distortion to at most ANALYSIS_MAX_TILES
+    square tiles; brightness still comes from analysis_img. Otherwise
+    color_features is None and callers derive it from analysis_img.
+
+    Tiling bounds the pixels counted, not the decode: only JPEG is decoded
+    at reduced scale, and every other format decodes each sampled frame at
+    full resolution before it is resized.
+    """
+    resample_gap = REDUCING_GAP if FAST_DECODE else None
+    with Image.open(source) as img:
+        original_size = img.size
+        _check_pixels(original_size)
+
+        columns, rows = tile_grid(*original_size, ANALYSIS_MAX_TILES)
+        grid_size = (columns * ANALYSIS_TILE_SIZE, rows * ANALYSIS_TILE_SIZE)
+
+        if FAST_DECODE and img.format == 'JPEG':
+            # Let libjpeg scale by 1/2, 1/4 or 1/8 while decoding
+            img.draft('RGB', (max(size[0], grid_size[0]), max(size[1], grid_size[1])) if tiled else size)
+
+        frame = img if img.mode == 'RGB' else img.convert('RGB')
+        analysis_img = frame.resize(size, reducing_gap=resample_gap)
+        if not tiled:
+            return analysis_img, original_size, None
+
+        # Running totals avoid keeping every sampled frame's grid, but each frame is still decoded in full first
+        counts = np.zeros(4, dtype=np.int64)
+        total_pixels = 0
+        for index in _frame_indices(getattr(img, 'n_frames', 1)):
+            if index:
+                img.seek(index)
+                frame = img if img.mode == 'RGB' else img.convert('RGB')
+            grid = np.asarray(frame.resize(grid_size, reducing_gap=resample_gap), dtype=np.uint8)
+            counts += color_counts(grid)
+            total_pixels += grid_size[0] * grid_size[1]
+
+    green, red, yellow, blue = counts / total_pixels
+    color_features = {
+        'green_ratio': float(green),
+        'red_ratio': float(red),
+        'yellow_ratio': float(yellow),
+        'blue_ratio': float(blue),
+        'brightness': extract_color_features(analysis_img)['brightness'],
+    }
+    return analysis_img, original_size, color_features
+
+
+def load_analysis_image(source, size=ANALYSIS_SIZE):
+    """Decode an image path or file object straight down to analysis size
+
+    Returns the RGB analysis image and the original (width, height).
+    """
+    analysis_img, original_size, _ = load_analysis(source, size, tiled=False)
+    return analysis_img, original_size
@@ -0,0 +1,115 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+
+from wiki_cache import CACHE_DIR
+
+# Delete uploads older than this many seconds
+JANITOR_MAX_AGE = int(os.environ.get('JANITOR_MAX_AGE', 3600))
+
+# Seconds between cleanup passes
+JANITOR_INTERVAL = float(os.environ.get('JANITOR_INTERVAL', 300))
+
+# Wall-clock budget of one incremental sweep, and the pause between sweeps of a pass
+JANITOR_SWEEP_BUDGET = float(os.environ.get('JANITOR_SWEEP_BUDGET', 0.05))
+JANITOR_SWEEP_PAUSE = float(os.environ.get('JANITOR_SWEEP_PAUSE', 0.2))
+
+# Only the worker holding this lock cleans up, so each host runs one janitor
+JANITOR_LOCK_PATH = os.environ.get('JANITOR_LOCK_PATH', os.path.join(CACHE_DIR, 'janitor.lock'))
+
+KEEP_FILES = {'.gitkeep'}
+
+
+class UploadJanitor:
+    """Background thread that deletes stale uploads in small time-bounded sweeps"""
+
+    def __init__(self, folder, max_age=JANITOR_MAX_AGE, interval=JANITOR_INTERVAL, lock_path=JANITOR_LOCK_PATH):
+        self.folder = folder
+        self.max_age = max_age
+        self.interval = interval
+        self.lock_path = lock_path
+        self._lock_file = None
+        self._thread = None
+        self._pid = None
+        self._stats = {'passes': 0, 'files_deleted': 0, 'bytes_reclaimed': 0, 'last_pass_at': None}
+
+    def start(self):
+        """Start the janitor thread in this process; safe to call more than once"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock_file = None
+        self._thread = threading.Thread(target=self._run, name='upload-janitor', daemon=True)
+        self._thread.start()
+
+    def _acquire(self):
+        """Try to become this host's janitor; the lock is held until the process exits"""
+        if self._lock_file is not None:
+            return True
+        try:
+            directory = os.path.dirname(self.lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lock_file = open(self.lock_path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+            return True
+        except OSError as e:
+            logging.error("Error acquiring janitor lock: %s", e)
+            return False
+
+    def _run(self):
+        while True:
+            if self._acquire():
+                try:
+                    self.clean()
+                except Exception as e:
+                    logging.error("Error cleaning up uploads: %s", e)
+            time.sleep(self.interval)
+
+    def clean(self):
+        """Run one full pass over the upload folder as a series of bounded sweeps"""
+        deleted = reclaimed = 0
+        cutoff = time.time() - self.max_age
+        with os.scandir(self.folder) as entries:
+            entries = iter(entries)
+            exhausted = False
+            while not exhausted:
+                sweep_deadline = time.monotonic() + JANITOR_SWEEP_BUDGET
+                while time.monotonic() < sweep_deadline:
+                    entry = next(entries, None)
+                    if entry is None:
+                        exhausted = True
+                        break
+                    if entry.name in KEEP_FILES:
+                        continue
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_mtime < cutoff:
+                            os.remove(entry.path)
+                            deleted += 1
+                            reclaimed += stat.st_size
+                    except FileNotFoundError:
+                        continue
+                if not exhausted:
+                    time.sleep(JANITOR_SWEEP_PAUSE)
+
+        self._stats['passes'] += 1
+        self._stats['files_deleted'] += deleted
+        self._stats['bytes_reclaimed'] += reclaimed
+        self._stats['last_pass_at'] = time.time()
+        if deleted:
+            logging.info("Upload janitor removed %s files (%s bytes)", deleted, reclaimed)
+        return deleted, reclaimed
+
+    def stats(self):
+        """Cleanup totals for this process (non-zero only in the worker holding the lock)"""
+        return dict(self._stats, active=self._lock_file is not None)
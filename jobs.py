@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+from wiki_cache import CACHE_DIR
+
+JOBS_PATH = os.environ.get('JOBS_PATH', os.path.join(CACHE_DIR, 'jobs.sqlite3'))
+
+# Background threads per gunicorn worker that claim and run queued jobs from any worker
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+
+# Queued plus running jobs allowed across all workers before new ones are refused
+MAX_PENDING_JOBS = int(os.environ.get('MAX_PENDING_JOBS', 64))
+
+# Seconds a job and its result are kept after submission
+JOB_TTL = int(os.environ.get('JOB_TTL', 600))
+
+# Upper bound on a single long-poll; each one holds a sync worker, so clients re-poll instead
+JOB_MAX_WAIT = float(os.environ.get('JOB_MAX_WAIT', 5))
+
+# Seconds between heartbeats of running jobs, and without one before a job is failed as orphaned
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 5))
+JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 30))
+
+# Longest an idle job thread sleeps between looks at the queue
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 0.5))
+
+# Bumped when the table layout changes; jobs are transient, so old tables are dropped
+SCHEMA_VERSION = 2
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOB_ERROR = 'An error occurred while processing your image.'
+JOB_ORPHANED_ERROR = 'The server restarted while processing your image. Please try again.'
+
+
+class QueueFull(Exception):
+    """Raised when MAX_PENDING_JOBS jobs are already waiting or running"""
+
+
+class JobStore:
+    """Job queue and results in a SQLite file shared by all workers
+
+    Queued jobs keep their arguments in the database and are claimed by the
+    job threads of whichever worker is free, so a job outlives the worker
+    that accepted it. Running jobs are kept alive by a heartbeat from their
+    owning process; one whose heartbeat stops is marked failed.
+
+    gate is a context manager factory entered around claiming and running
+    each job, so jobs can share a concurrency limit with request handling.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self.tasks = {}
+        self.gate = nullcontext
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._conn = None
+        self._pid = None
+        self._threads_pid = None
+        self._owner = None
+
+    def task(self, fn):
+        """Register fn so submit(fn, ...) can run it in any worker"""
+        self.tasks[fn.__name__] = fn
+        return fn
+
+    def _connection(self):
+        """Open the database lazily, once per process"""
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                    conn.execute('DROP TABLE IF EXISTS jobs')
+                    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS jobs ('
+                    'id TEXT PRIMARY KEY, status TEXT NOT NULL, task TEXT NOT NULL, payload BLOB, '
+                    'result TEXT, error TEXT, owner TEXT, heartbeat_at REAL, '
+                    'created_at REAL NOT NULL, expires_at REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connection().execute(sql, params)
+
+    def start(self):
+        """Start this process's job and heartbeat threads; safe to call more than once"""
+        with self._lock:
+            if self._threads_pid == os.getpid():
+                return
+            self._threads_pid = os.getpid()
+            # Unique per process, unlike the pid, so a worker reusing a dead worker's pid cannot keep its jobs alive
+            self._owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+            self._wakeup = threading.Event()
+        for index in range(JOB_WORKERS):
+            threading.Thread(target=self._work, name=f'job-{index}', daemon=True).start()
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+
+    def submit(self, fn, *args):
+        """Queue a registered task fn(*args) and return the job id; its return value must be JSON-serializable"""
+        if self.tasks.get(fn.__name__) is not fn:
+            raise ValueError(f'{fn.__name__} is not a registered job task')
+        self.start()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        payload = pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM jobs WHERE expires_at < ?', (now,))
+                pending = conn.execute(
+                    'SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)', (JOB_QUEUED, JOB_RUNNING)
+                ).fetchone()[0]
+                if pending >= MAX_PENDING_JOBS:
+                    raise QueueFull()
+                conn.execute(
+                    'INSERT INTO jobs (id, status, task, payload, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (job_id, JOB_QUEUED, fn.__name__, payload, now, now + JOB_TTL),
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        self._wakeup.set()
+        return job_id
+
+    def _claim(self):
+        """Fail orphaned jobs, then take the oldest queued job; returns (id, task, payload) or None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'UPDATE jobs SET status = ?, error = ?, payload = NULL WHERE status = ? AND heartbeat_at < ?',
+                    (JOB_FAILED, JOB_ORPHANED_ERROR, JOB_RUNNING, now - JOB_STALE_AFTER),
+                )
+                row = conn.execute(
+                    'SELECT id, task, payload FROM jobs WHERE status = ? AND expires_at >= ? '
+                    'ORDER BY created_at LIMIT 1', (JOB_QUEUED, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE jobs SET status = ?, owner = ?, heartbeat_at = ? WHERE id = ?',
+                                 (JOB_RUNNING, self._owner, now, row[0]))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return row
+
+    def _work(self):
+        delay = 0.01
+        while True:
+            with self.gate():
+                try:
+                    job = self._claim()
+                except sqlite3.Error as e:
+                    logging.error("Error claiming job: %s", e)
+                    job = None
+                if job is not None:
+                    self._run(*job)
+            if job is None:
+                # Jobs submitted in this process wake the thread at once; others are found by polling
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                delay = min(delay * 2, JOB_POLL_INTERVAL)
+                continue
+            delay = 0.01
+
+    def _run(self, job_id, task, payload):
+        try:
+            result = self.tasks[task](*pickle.loads(payload))
+        except Exception as e:
+            logging.error("Error running job %s: %s", job_id, e)
+            self._execute('UPDATE jobs SET status = ?, error = ?, payload = NULL WHERE id = ?',
+                          (JOB_FAILED, JOB_ERROR, job_id))
+        else:
+            self._execute('UPDATE jobs SET status = ?, result = ?, payload = NULL WHERE id = ?',
+                          (JOB_DONE, json.dumps(result), job_id))
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                self._execute('UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND owner = ?',
+                              (time.time(), JOB_RUNNING, self._owner))
+            except sqlite3.Error as e:
+                logging.error("Error updating job heartbeat: %s", e)
+
+    def get(self, job_id, wait=0):
+        """Return the job as a dict, or None if unknown or expired
+
+        With wait > 0, block up to that many seconds for the job to finish.
+        """
+        deadline = time.monotonic() + min(wait, JOB_MAX_WAIT)
+        delay = 0.05
+        while True:
+            row = self._execute(
+                'SELECT status, result, error FROM jobs WHERE id = ? AND expires_at >= ?', (job_id, time.time())
+            ).fetchone()
+            if row is None:
+                return None
+            status, result, error = row
+            if status in (JOB_DONE, JOB_FAILED) or time.monotonic() >= deadline:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        job = {'job_id': job_id, 'status': status}
+        if result is not None:
+            job['result'] = json.loads(result)
+        if error is not None:
+            job['error'] = error
+        return job
+
+
+job_store = JobStore()
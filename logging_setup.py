@@ -0,0 +1,124 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+
+# Root log level; DEBUG is for development only
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+# 'json' for one structured record per line, 'text' for human-readable lines
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
+# Fraction of requests whose INFO and DEBUG records are kept; warnings and errors are always kept
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+
+_context = threading.local()
+
+
+def set_request_context(request_id):
+    """Tag records logged on this thread with request_id until clear_request_context()"""
+    _context.request_id = request_id
+    # Sample per request so a kept request keeps all of its records
+    _context.sampled = LOG_SAMPLE_RATE >= 1 or (zlib.crc32(request_id.encode()) / 2 ** 32) < LOG_SAMPLE_RATE
+
+
+def clear_request_context():
+    _context.request_id = None
+    _context.sampled = True
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id and drop unsampled success-path records"""
+
+    def filter(self, record):
+        record.request_id = getattr(_context, 'request_id', None) or '-'
+        return record.levelno >= logging.WARNING or getattr(_context, 'sampled', True)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; extra={'fields': {...}} adds structured fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        if getattr(record, 'request_id', '-') != '-':
+            entry['request_id'] = record.request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread
+
+    The stock prepare() formats each record on the logging thread so it can
+    be pickled; records here never leave the process, so that is skipped.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _QueueLogging:
+    """Root QueueHandler whose records are written by a QueueListener thread
+
+    The listener thread does not survive fork, so it is restarted in every
+    child; records queued in the parent before forking stay with the parent.
+    """
+
+    def __init__(self, output):
+        self.handler = DeferredQueueHandler(queue.SimpleQueue())
+        self.handler.addFilter(RequestContextFilter())
+        self.output = output
+        self.listener = None
+        self._start()
+        os.register_at_fork(after_in_child=self._restart)
+        atexit.register(self._stop)
+
+    def _start(self):
+        self.listener = logging.handlers.QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    def _restart(self):
+        self.handler.queue = queue.SimpleQueue()
+        self._start()
+
+    def _stop(self):
+        # Flush what is still queued before the process exits
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+_logging = None
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, stream=None):
+    """Route all logging through a background writer thread; safe to call more than once"""
+    global _logging
+    if _logging is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stderr)
+    if log_format == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'))
+
+    _logging = _QueueLogging(output)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_logging.handler)
+    root.setLevel(level)
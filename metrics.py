@@ -0,0 +1,297 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from wiki_cache import CACHE_DIR
+
+# Each process writes its totals here as <pid>.<token>.json; /metrics sums every file.
+# Files of exited processes are folded into retired.json, so the directory stays small.
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(CACHE_DIR, 'metrics'))
+
+# Seconds between flushes of a worker's totals to its file
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+# Add a Server-Timing header with per-stage durations to every response
+SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '0') == '1'
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRIC_HELP = {
+    'flora_request_seconds': ('histogram', 'Request latency by endpoint'),
+    'flora_stage_seconds': ('histogram', 'Time spent in each processing stage'),
+    'flora_http_request_seconds': ('histogram', 'Outbound HTTP request latency'),
+    'flora_cache_requests_total': ('counter', 'Cache lookups by cache and outcome'),
+    'flora_http_requests_total': ('counter', 'Outbound HTTP requests by target and outcome'),
+    'flora_admission_total': ('counter', 'Admission decisions by pool and outcome'),
+    'flora_errors_total': ('counter', 'Handled errors by where they occurred'),
+}
+
+
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for name, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """Counters and histograms kept per process and summed across workers on read
+
+    Recording is an in-memory update; totals are written to METRICS_DIR at
+    most every METRICS_FLUSH_INTERVAL seconds, so any worker can render the
+    aggregate for the whole host. start() adds a thread that flushes on that
+    interval even while the process is idle, and totals are flushed at exit.
+    """
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self._local = threading.local()
+        self._thread_pid = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _reset(self):
+        """Start from zero in a forked child instead of double-counting the parent"""
+        self._lock = threading.Lock()
+        # A new process reusing an exited one's pid must not overwrite its file
+        self._token = uuid.uuid4().hex[:8]
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._dirty = False
+
+    def start(self):
+        """Start this process's periodic flush thread; safe to call more than once"""
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+        self._maybe_flush()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            self._dirty = True
+        self._maybe_flush()
+
+    @contextmanager
+    def timer(self, stage):
+        """Time a block as flora_stage_seconds{stage=...} and note it for Server-Timing"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.observe('flora_stage_seconds', elapsed, stage=stage)
+            timings = getattr(self._local, 'timings', None)
+            if timings is not None:
+                timings.append((stage, elapsed))
+
+    def start_request(self):
+        """Begin collecting stage timings for the request on this thread"""
+        self._local.timings = []
+        self._local.started = time.monotonic()
+
+    def finish_request(self, endpoint):
+        """Record the request latency and return its [(stage, seconds)] timings"""
+        timings = getattr(self._local, 'timings', None)
+        if timings is None:
+            return []
+        self.observe('flora_request_seconds', time.monotonic() - self._local.started, endpoint=endpoint)
+        self._local.timings = None
+        return timings
+
+    def _path(self):
+        return os.path.join(self.directory, f'{os.getpid()}.{self._token}.json')
+
+    def _maybe_flush(self):
+        if time.monotonic() - self._last_flush >= METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write this process's totals to its file"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = {
+                'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, labels, values] for (name, labels), values in self._histograms.items()],
+            }
+            self._dirty = False
+            self._last_flush = time.monotonic()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path()
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error("Error writing metrics: %s", e)
+
+    @contextmanager
+    def _directory_lock(self, mode):
+        """Readers share the lock; folding files into retired.json takes it exclusively"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, filenames):
+        """Sum the snapshots in filenames into (counters, histograms)"""
+        counters = {}
+        histograms = {}
+        for filename in filenames:
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+        return counters, histograms
+
+    def _filenames(self):
+        try:
+            return [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except FileNotFoundError:
+            return []
+
+    def _collect(self):
+        """Sum the totals of every process that has flushed, including exited ones"""
+        try:
+            with self._directory_lock(fcntl.LOCK_SH):
+                return self._read(self._filenames())
+        except OSError as e:
+            logging.error("Error reading metrics: %s", e)
+            return {}, {}
+
+    def retire(self, pids=None):
+        """Fold the files of exited processes into retired.json and delete them
+
+        pids names processes known to have exited, as gunicorn's child_exit
+        hook does; by default every file whose process is gone is retired,
+        which also covers batch pool children.
+        """
+        try:
+            with self._directory_lock(fcntl.LOCK_EX):
+                filenames = [name for name in self._filenames()
+                             if name != RETIRED_FILE and _exited(int(name.split('.', 1)[0]), pids)]
+                if not filenames:
+                    return
+                counters, histograms = self._read([RETIRED_FILE] + filenames)
+                path = os.path.join(self.directory, RETIRED_FILE)
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump({
+                        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                        'histograms': [[name, labels, values] for (name, labels), values in histograms.items()],
+                    }, f)
+                os.replace(tmp_path, path)
+                for filename in filenames:
+                    os.remove(os.path.join(self.directory, filename))
+        except OSError as e:
+            logging.error("Error retiring metrics files: %s", e)
+
+    def clear(self):
+        """Delete every process's totals; called once as the server starts"""
+        try:
+            with self._directory_lock(fcntl.LOCK_EX):
+                for filename in os.listdir(self.directory):
+                    if filename != LOCK_FILE:
+                        os.remove(os.path.join(self.directory, filename))
+        except OSError as e:
+            logging.error("Error clearing metrics: %s", e)
+
+    def render(self):
+        """All workers' metrics in the Prometheus text exposition format"""
+        self.flush()
+        self.retire()
+        counters, histograms = self._collect()
+        series = {}
+        for (name, labels), value in sorted(counters.items()):
+            series.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), values in sorted(histograms.items()):
+            lines = series.setdefault(name, [])
+            for bound, count in zip(BUCKETS, values):
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {values[-1]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-2])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {values[-1]}')
+
+        output = []
+        for name in sorted(series):
+            metric_type, help_text = METRIC_HELP.get(name, ('untyped', name))
+            output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+
+def _exited(pid, pids):
+    if pids is not None:
+        return pid in pids
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def server_timing_header(timings):
+    """Format [(stage, seconds)] as a Server-Timing header value"""
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in timings)
+
+
+metrics = Metrics()
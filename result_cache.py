@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import metrics
+
+# Maximum /predict results kept per tier in each worker
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 1024))
+
+# Also match re-encoded or resized copies by perceptual hash and color signature of the analysis image
+RESULT_CACHE_PERCEPTUAL = os.environ.get('RESULT_CACHE_PERCEPTUAL', '1') == '1'
+
+
+class ResultCache:
+    """Bounded LRU of /predict results keyed by upload hash and perceptual hash"""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._by_content = OrderedDict()
+        self._by_perceptual = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('content_hits', 'perceptual_hits', 'misses', 'evictions'), 0)
+
+    def _lookup(self, tier, key):
+        result = tier.get(key)
+        if result is not None:
+            tier.move_to_end(key)
+        return result
+
+    def _store(self, tier, key, result):
+        tier[key] = result
+        tier.move_to_end(key)
+        while len(tier) > self.max_entries:
+            tier.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def get(self, content_key):
+        """Result for byte-identical uploads"""
+        with self._lock:
+            result = self._lookup(self._by_content, content_key)
+            self._counters['content_hits' if result is not None else 'misses'] += 1
+        metrics.inc('flora_cache_requests_total', cache='result', outcome='hit' if result is not None else 'miss')
+        return result
+
+    def get_similar(self, perceptual_key):
+        """Result for visually identical uploads; only called after a content miss"""
+        with self._lock:
+            result = self._lookup(self._by_perceptual, perceptual_key)
+            if result is not None:
+                self._counters['perceptual_hits'] += 1
+                self._counters['misses'] -= 1
+        metrics.inc('flora_cache_requests_total', cache='result_perceptual', outcome='hit' if result is not None else 'miss')
+        return result
+
+    def put(self, content_key, perceptual_key, result):
+        with self._lock:
+            if content_key is not None:
+                self._store(self._by_content, content_key, result)
+            if perceptual_key is not None:
+                self._store(self._by_perceptual, perceptual_key, result)
+
+    def stats(self):
+        """Hit-rate counters for this process"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._by_content)
+        lookups = stats['content_hits'] + stats['perceptual_hits'] + stats['misses']
+        hits = stats['content_hits'] + stats['perceptual_hits']
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+result_cache = ResultCache()
@@ -0,0 +1,215 @@
+"""Nearest-neighbor species index over image feature vectors
+
+Build an index from a directory holding one sub-directory of reference
+photos per species (the sub-directory name is the species name):
+
+    python species_index.py build reference_photos/ [--output data/species_index.npz]
+
+and query it with one or more images:
+
+    python species_index.py query photo1.jpg photo2.jpg
+"""
+import argparse
+import logging
+import os
+
+import numpy as np
+
+from features import FEATURE_VECTOR_SIZE, feature_vector
+from ingest import load_analysis_image
+
+SPECIES_INDEX_PATH = os.environ.get(
+    'SPECIES_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'species_index.npz'))
+
+# Neighbors consulted per query
+SPECIES_INDEX_NEIGHBORS = int(os.environ.get('SPECIES_INDEX_NEIGHBORS', 5))
+
+# Reference sets up to this size are searched exhaustively; larger ones are clustered
+EXACT_SEARCH_LIMIT = int(os.environ.get('SPECIES_INDEX_EXACT_LIMIT', 4096))
+
+# Clusters scanned per query in a clustered index
+SPECIES_INDEX_PROBES = int(os.environ.get('SPECIES_INDEX_PROBES', 8))
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+
+
+def _squared_distances(queries, vectors, vector_norms):
+    """Pairwise squared Euclidean distances via a single matrix product"""
+    query_norms = np.einsum('ij,ij->i', queries, queries)
+    distances = query_norms[:, None] - 2 * queries @ vectors.T + vector_norms[None, :]
+    return np.maximum(distances, 0, out=distances)
+
+
+def _kmeans(vectors, clusters, iterations=15, seed=0):
+    """Plain Lloyd's k-means with a fixed seed, so rebuilt indexes are identical"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[np.sort(rng.choice(len(vectors), clusters, replace=False))].copy()
+    for _ in range(iterations):
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignments = np.argmin(_squared_distances(vectors, centroids, centroid_norms), axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=clusters)
+        occupied = counts > 0
+        centroids[occupied] = sums[occupied] / counts[occupied, None]
+    return centroids, assignments
+
+
+class SpeciesIndex:
+    """Reference feature vectors labelled by species
+
+    Small reference sets are searched exactly with one matrix product per
+    batch. Larger ones are partitioned with k-means into about sqrt(n)
+    clusters stored contiguously, and each query scans only the clusters
+    nearest to it, so lookup cost grows roughly with sqrt(n).
+    """
+
+    def __init__(self, vectors, labels, centroids=None, assignments=None, clusters=None):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, FEATURE_VECTOR_SIZE)
+        labels = np.asarray(labels)
+
+        if centroids is None:
+            if clusters is None:
+                clusters = int(np.sqrt(len(vectors))) if len(vectors) > EXACT_SEARCH_LIMIT else 0
+            if clusters:
+                centroids, assignments = _kmeans(vectors, clusters)
+
+        if centroids is not None:
+            order = np.argsort(assignments, kind='stable')
+            vectors, labels, assignments = vectors[order], labels[order], np.asarray(assignments)[order]
+            self.centroids = np.asarray(centroids, dtype=np.float32)
+            self.centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+            self.offsets = np.searchsorted(assignments, np.arange(len(self.centroids) + 1))
+        else:
+            self.centroids = None
+
+        self.vectors = vectors
+        self.labels = labels
+        self.assignments = assignments
+        self.vector_norms = np.einsum('ij,ij->i', vectors, vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _nearest(self, distances, candidates, k):
+        # Stable sort over ascending candidate positions breaks ties deterministically
+        order = np.argsort(distances, kind='stable')[:k]
+        return distances[order], candidates[order]
+
+    def query(self, queries, k=SPECIES_INDEX_NEIGHBORS):
+        """Return (squared distances, indices) of the k nearest references per query row"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, FEATURE_VECTOR_SIZE)
+        k = min(k, len(self.vectors))
+
+        if self.centroids is None:
+            distances = _squared_distances(queries, self.vectors, self.vector_norms)
+            indices = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            return np.take_along_axis(distances, indices, axis=1), indices
+
+        probes = min(SPECIES_INDEX_PROBES, len(self.centroids))
+        centroid_distances = _squared_distances(queries, self.centroids, self.centroid_norms)
+        nearest_clusters = np.argsort(centroid_distances, axis=1, kind='stable')[:, :probes]
+
+        all_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        all_indices = np.zeros((len(queries), k), dtype=np.int64)
+        for row, clusters in enumerate(nearest_clusters):
+            candidates = np.concatenate(
+                [np.arange(self.offsets[c], self.offsets[c + 1]) for c in np.sort(clusters)])
+            distances = _squared_distances(
+                queries[row:row + 1], self.vectors[candidates], self.vector_norms[candidates])[0]
+            found_distances, found = self._nearest(distances, candidates, k)
+            all_distances[row, :len(found)] = found_distances
+            all_indices[row, :len(found)] = found
+        return all_distances, all_indices
+
+    def classify(self, queries, k=SPECIES_INDEX_NEIGHBORS):
+        """Return a (species, confidence) pair per query by distance-weighted vote"""
+        results = []
+        for distances, indices in zip(*self.query(queries, k)):
+            votes = {}
+            for distance, index in zip(distances, indices):
+                if np.isfinite(distance):
+                    label = str(self.labels[index])
+                    votes[label] = votes.get(label, 0.0) + 1.0 / (1e-6 + float(np.sqrt(distance)))
+            # Highest vote wins; ties go to the label seen first, i.e. the nearest one
+            label = max(votes, key=votes.get)
+            results.append((label, votes[label] / sum(votes.values())))
+        return results
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {'vectors': self.vectors, 'labels': self.labels}
+        if self.centroids is not None:
+            arrays.update(centroids=self.centroids, assignments=self.assignments)
+        np.savez_compressed(path, **arrays)
+
+
+def load_species_index(path=SPECIES_INDEX_PATH):
+    """Load a prebuilt index, or return None when none has been built"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return SpeciesIndex(
+                data['vectors'], data['labels'],
+                data['centroids'] if 'centroids' in data else None,
+                data['assignments'] if 'assignments' in data else None,
+            )
+    except Exception as e:
+        logging.error("Error loading species index: %s", e)
+        return None
+
+
+def image_vector(image_source):
+    """Feature vector for an image path or file object"""
+    analysis_img, original_size = load_analysis_image(image_source)
+    return feature_vector(analysis_img, original_size)
+
+
+def build_index(reference_dir):
+    """Build an index from reference_dir/<species name>/<images>"""
+    vectors = []
+    labels = []
+    for species in sorted(os.listdir(reference_dir)):
+        species_dir = os.path.join(reference_dir, species)
+        if not os.path.isdir(species_dir):
+            continue
+        for filename in sorted(os.listdir(species_dir)):
+            if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            try:
+                vectors.append(image_vector(os.path.join(species_dir, filename)))
+                labels.append(species)
+            except Exception as e:
+                logging.error("Skipping reference image %s: %s", filename, e)
+    return SpeciesIndex(np.array(vectors), np.array(labels))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='build an index from reference photos')
+    build.add_argument('reference_dir')
+    build.add_argument('--output', default=SPECIES_INDEX_PATH)
+    query = subparsers.add_parser('query', help='classify images against the index')
+    query.add_argument('images', nargs='+')
+    query.add_argument('--index', default=SPECIES_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build_index(args.reference_dir)
+        index.save(args.output)
+        print(f"Indexed {len(index)} reference images of {len(set(index.labels))} species into {args.output}")
+    else:
+        index = load_species_index(args.index)
+        if index is None:
+            parser.error(f"No species index at {args.index}")
+        vectors = np.array([image_vector(path) for path in args.images])
+        for path, (species, confidence) in zip(args.images, index.classify(vectors)):
+            print(f"{path}: {species} ({confidence:.2f})")
+
+
+if __name__ == '__main__':
+    main()
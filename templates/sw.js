@@ -1,15 +1,16 @@
 // Flora PWA Service Worker
-const CACHE_NAME = 'flora-v1.0.0';
+// Rendered by app.py: asset URLs are fingerprinted and the cache name changes with them
+const CACHE_NAME = {{ cache_name|tojson }};
 const STATIC_CACHE_URLS = [
   '/',
   '/app',
-  '/static/landing.css',
-  '/static/landing.js',
-  '/static/style.css',
-  '/static/script.js',
-  '/static/icon-192.png',
-  '/static/icon-512.png',
-  '/manifest.json',
+  {{ asset_url('landing.css')|tojson }},
+  {{ asset_url('landing.js')|tojson }},
+  {{ asset_url('style.css')|tojson }},
+  {{ asset_url('script.js')|tojson }},
+  {{ asset_url('icon-192.png')|tojson }},
+  {{ asset_url('icon-512.png')|tojson }},
+  {{ url_for('static', filename='manifest.json')|tojson }},
   // External CDN resources
   'https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css',
   'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Keep caches and metrics files written on import out of the working tree
+os.environ.setdefault('FLORA_CACHE_DIR', tempfile.mkdtemp(prefix='flora-tests-'))
+
+# Import app without warming up or starting its background threads, as under gunicorn's hooks
+os.environ.setdefault('FLORA_WORKER_HOOKS', '1')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_wikipedia import start_stub  # noqa: E402
+
+
+@pytest.fixture
+def stub_wikipedia():
+    server = start_stub()
+    yield server
+    server.shutdown()
+    server.server_close()
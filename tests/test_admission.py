@@ -0,0 +1,31 @@
+import pytest
+
+import admission
+from admission import TokenBucket
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import app
+    # One request per client per minute, with buckets in a fresh file
+    monkeypatch.setattr(admission, 'rate_limiter', TokenBucket(1, 1, directory=str(tmp_path)))
+    return app.app.test_client()
+
+
+def chat(client, forwarded_for):
+    return client.post('/chat', json={'message': 'hello'}, headers={'X-Forwarded-For': forwarded_for},
+                       environ_base={'REMOTE_ADDR': '10.0.0.1'})
+
+
+def test_rate_limit_buckets_are_per_forwarded_client(client):
+    assert chat(client, '203.0.113.7').status_code == 200
+    assert chat(client, '203.0.113.7').status_code == 429
+    # Same proxy address, different client: its own bucket is still full
+    assert chat(client, '198.51.100.23').status_code == 200
+
+
+def test_rate_limited_response_says_when_to_retry(client):
+    chat(client, '203.0.113.7')
+    response = chat(client, '203.0.113.7')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
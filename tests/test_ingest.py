@@ -0,0 +1,34 @@
+import io
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+
+import ingest
+from ingest import UploadRequest, bytes_digest, upload_digest
+
+
+def parse_upload(data, max_file_size):
+    environ = EnvironBuilder(method='POST', data={'image': (io.BytesIO(data), 'leaf.png')}).get_environ()
+    request = UploadRequest(environ)
+    request.max_file_size = max_file_size
+    return request.files['image']
+
+
+@pytest.mark.parametrize('spool', [False, True])
+def test_file_over_limit_is_refused_while_parsing(monkeypatch, spool):
+    monkeypatch.setattr(ingest, 'SPOOL_UPLOADS', spool)
+
+    with pytest.raises(RequestEntityTooLarge):
+        parse_upload(b'x' * 4096, max_file_size=1024)
+
+
+@pytest.mark.parametrize('spool', [False, True])
+def test_file_within_limit_is_hashed_while_parsing(monkeypatch, spool):
+    monkeypatch.setattr(ingest, 'SPOOL_UPLOADS', spool)
+    data = bytes(range(256)) * 4
+
+    file = parse_upload(data, max_file_size=1024)
+
+    assert upload_digest(file) == bytes_digest(data)
+    assert file.stream.read() == data
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+from wiki_cache import STATUS_OK
+from wiki_client import WikipediaClient
+
+
+def test_rest_hit(stub_wikipedia):
+    client = WikipediaClient(base_url=stub_wikipedia.base_url)
+
+    assert client.fetch_summary('Rosa hybrid') == (STATUS_OK, 'REST summary of Rosa hybrid.')
+    assert stub_wikipedia.paths() == ['/api/rest_v1/page/summary/Rosa_hybrid']
+
+
+def test_rest_404_falls_back_to_query(stub_wikipedia):
+    stub_wikipedia.rest_missing.add('Ficus lyrata')
+    client = WikipediaClient(base_url=stub_wikipedia.base_url)
+
+    status, text = client.fetch_summary('Ficus lyrata')
+
+    assert status == STATUS_OK
+    assert text.startswith('Query extract of Ficus lyrata')
+    assert stub_wikipedia.paths() == ['/api/rest_v1/page/summary/Ficus_lyrata', '/w/api.php']
+
+
+def test_concurrent_callers_share_one_fetch(stub_wikipedia):
+    stub_wikipedia.rest_latency = 0.3
+    client = WikipediaClient(base_url=stub_wikipedia.base_url)
+    callers = 8
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def call():
+        barrier.wait()
+        results.append(client.fetch_summary('Monstera deliciosa'))
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [(STATUS_OK, 'REST summary of Monstera deliciosa.')] * callers
+    assert len(stub_wikipedia.paths()) == 1
+    assert client.stats()['coalesced'] == callers - 1
+
+
+def test_hedged_query_wins_when_rest_is_slow(stub_wikipedia):
+    stub_wikipedia.rest_latency = 1.0
+    client = WikipediaClient(base_url=stub_wikipedia.base_url, hedge_delay='0.05')
+
+    start = time.monotonic()
+    status, text = client.fetch_summary('Aloe vera')
+    elapsed = time.monotonic() - start
+
+    assert status == STATUS_OK
+    assert text.startswith('Query extract of Aloe vera')
+    assert elapsed < 0.8
+    assert client.stats()['hedged'] == 1
+
+
+def test_hedge_not_started_when_rest_is_fast(stub_wikipedia):
+    client = WikipediaClient(base_url=stub_wikipedia.base_url, hedge_delay='0.5')
+
+    assert client.fetch_summary('Aloe vera') == (STATUS_OK, 'REST summary of Aloe vera.')
+    assert stub_wikipedia.paths('/w/api.php') == []
+    assert client.stats()['hedged'] == 0
+
+
+def test_session_rebuilt_after_fork(stub_wikipedia):
+    client = WikipediaClient(base_url=stub_wikipedia.base_url)
+    client.fetch_summary('Rosa hybrid')
+    parent_session = client._session
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            fresh = client._session is None
+            status, _ = client.fetch_summary('Hedera helix')
+            rebuilt = client._session is not None and client._session is not parent_session
+            os.write(write_fd, f'{fresh} {status} {rebuilt}'.encode())
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        report = f.read()
+    os.waitpid(pid, 0)
+
+    assert report == f'True {STATUS_OK} True'
+    assert client._session is parent_session
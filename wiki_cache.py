@@ -0,0 +1,157 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.environ.get('FLORA_CACHE_DIR', 'cache')
+WIKI_CACHE_PATH = os.environ.get('WIKI_CACHE_PATH', os.path.join(CACHE_DIR, 'wikipedia.sqlite3'))
+
+# Seconds to keep a found description, a confirmed miss, and a failed fetch
+WIKI_CACHE_TTL = int(os.environ.get('WIKI_CACHE_TTL', 7 * 24 * 3600))
+WIKI_CACHE_MISS_TTL = int(os.environ.get('WIKI_CACHE_MISS_TTL', 24 * 3600))
+WIKI_CACHE_ERROR_TTL = int(os.environ.get('WIKI_CACHE_ERROR_TTL', 60))
+
+# Entries kept in the per-process LRU tier
+WIKI_CACHE_MEMORY_SIZE = int(os.environ.get('WIKI_CACHE_MEMORY_SIZE', 512))
+
+# Outcome of a Wikipedia lookup
+STATUS_OK = 'ok'
+STATUS_MISSING = 'missing'
+STATUS_ERROR = 'error'
+
+
+class WikiCache:
+    """Two-tier cache of Wikipedia lookups: per-process LRU over a shared SQLite file
+
+    Values are (status, text) pairs. Misses and errors are cached too, with
+    their own shorter TTLs, so an outage does not turn into a request storm.
+    """
+
+    def __init__(self, path=WIKI_CACHE_PATH, memory_size=WIKI_CACHE_MEMORY_SIZE):
+        self.path = path
+        self.memory_size = memory_size
+        self.ttls = {
+            STATUS_OK: WIKI_CACHE_TTL,
+            STATUS_MISSING: WIKI_CACHE_MISS_TTL,
+            STATUS_ERROR: WIKI_CACHE_ERROR_TTL,
+        }
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._counters = dict.fromkeys(
+            ('memory_hits', 'disk_hits', 'negative_hits', 'misses', 'stores', 'disk_errors'), 0)
+
+    def _connection(self):
+        """Open the SQLite tier lazily, once per process (connections must not cross fork)"""
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS wiki_summary ('
+                'name TEXT PRIMARY KEY, status TEXT NOT NULL, text TEXT, expires_at REAL NOT NULL)'
+            )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, name, entry):
+        self._memory[name] = entry
+        self._memory.move_to_end(name)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _count(self, key):
+        self._counters[key] += 1
+
+    def get(self, name):
+        """Return a fresh (status, text) pair for name, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(name)
+            if entry is not None:
+                expires_at, status, text = entry
+                if expires_at > now:
+                    self._memory.move_to_end(name)
+                    self._count('memory_hits')
+                    if status != STATUS_OK:
+                        self._count('negative_hits')
+                    return status, text
+                del self._memory[name]
+
+            try:
+                row = self._connection().execute(
+                    'SELECT status, text, expires_at FROM wiki_summary WHERE name = ?', (name,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logging.error("Error reading Wikipedia cache: %s", e)
+                self._count('disk_errors')
+                row = None
+
+            if row is not None and row[2] > now:
+                status, text, expires_at = row
+                self._remember(name, (expires_at, status, text))
+                self._count('disk_hits')
+                if status != STATUS_OK:
+                    self._count('negative_hits')
+                return status, text
+
+            self._count('misses')
+            return None
+
+    def put(self, name, status, text=None):
+        """Store a lookup outcome in both tiers with the TTL for its status"""
+        expires_at = time.time() + self.ttls[status]
+        with self._lock:
+            self._remember(name, (expires_at, status, text))
+            self._count('stores')
+            try:
+                self._connection().execute(
+                    'INSERT OR REPLACE INTO wiki_summary (name, status, text, expires_at) VALUES (?, ?, ?, ?)',
+                    (name, status, text, expires_at),
+                )
+            except sqlite3.Error as e:
+                logging.error("Error writing Wikipedia cache: %s", e)
+                self._count('disk_errors')
+
+    def preload(self, limit=None):
+        """Fill the memory tier with the freshest entries from disk; returns how many were loaded
+
+        Called in the gunicorn master before forking so workers start with a
+        warm, copy-on-write shared memory tier.
+        """
+        limit = limit or self.memory_size
+        now = time.time()
+        with self._lock:
+            try:
+                rows = self._connection().execute(
+                    'SELECT name, status, text, expires_at FROM wiki_summary WHERE expires_at > ? '
+                    'ORDER BY expires_at DESC LIMIT ?', (now, limit)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logging.error("Error preloading Wikipedia cache: %s", e)
+                return 0
+            for name, status, text, expires_at in reversed(rows):
+                self._remember(name, (expires_at, status, text))
+            # The connection must not be shared with forked workers
+            self._conn.close()
+            self._conn = None
+        return len(rows)
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+wiki_cache = WikiCache()
@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from wiki_cache import STATUS_ERROR, STATUS_MISSING, STATUS_OK
+
+WIKIPEDIA_BASE_URL = os.environ.get('WIKIPEDIA_BASE_URL', 'https://en.wikipedia.org').rstrip('/')
+
+# Seconds to wait for the TCP/TLS handshake and for each read
+WIKI_CONNECT_TIMEOUT = float(os.environ.get('WIKI_CONNECT_TIMEOUT', 3.05))
+WIKI_READ_TIMEOUT = float(os.environ.get('WIKI_READ_TIMEOUT', 5))
+
+# Start the api.php fallback in parallel once the REST call is this slow (unset disables hedging)
+WIKI_HEDGE_DELAY = os.environ.get('WIKI_HEDGE_DELAY')
+
+WIKI_POOL_SIZE = int(os.environ.get('WIKI_POOL_SIZE', 4))
+
+USER_AGENT = 'Flora/0.1 (plant identifier; https://github.com/t4zn/flora1)'
+
+
+class _Call:
+    """An in-flight fetch that concurrent callers for the same name wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class WikipediaClient:
+    """Pooled keep-alive client for Wikipedia summaries
+
+    The session and hedging executor are created lazily and rebuilt in a
+    forked child, so the client is safe to create before gunicorn forks.
+    """
+
+    def __init__(self, base_url=WIKIPEDIA_BASE_URL, hedge_delay=WIKI_HEDGE_DELAY):
+        self.base_url = base_url
+        self.hedge_delay = float(hedge_delay) if hedge_delay else None
+        self.timeout = (WIKI_CONNECT_TIMEOUT, WIKI_READ_TIMEOUT)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._session = None
+        self._executor = None
+        self._counters = dict.fromkeys(('requests', 'errors', 'coalesced', 'hedged'), 0)
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        """Drop connections and threads inherited from the parent process"""
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._session = None
+        self._executor = None
+
+    def _get_session(self):
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=WIKI_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            self._session = session
+        return self._session
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=WIKI_POOL_SIZE, thread_name_prefix='wiki')
+        return self._executor
+
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _get(self, url, params=None):
+        self._count('requests')
+        start = time.monotonic()
+        try:
+            response = self._get_session().get(url, params=params, timeout=self.timeout)
+        except requests.RequestException:
+            self._count('errors')
+            metrics.inc('flora_http_requests_total', target='wikipedia', outcome='error')
+            raise
+        finally:
+            metrics.observe('flora_http_request_seconds', time.monotonic() - start, target='wikipedia')
+        metrics.inc('flora_http_requests_total', target='wikipedia', outcome=str(response.status_code))
+        return response
+
+    def _fetch_rest(self, plant_name):
+        """REST summary endpoint; None means the fallback query should be tried"""
+        url = f"{self.base_url}/api/rest_v1/page/summary/" + plant_name.replace(" ", "_")
+        response = self._get(url)
+        if response.status_code == 200:
+            data = response.json()
+            return STATUS_OK, data.get('extract', 'No description available for this plant.')
+        return None
+
+    def _fetch_query(self, plant_name):
+        """action=query fallback for titles the REST endpoint does not resolve"""
+        params = {
+            'action': 'query',
+            'format': 'json',
+            'titles': plant_name,
+            'prop': 'extracts',
+            'exintro': True,
+            'explaintext': True,
+            'exsectionformat': 'plain'
+        }
+        response = self._get(f"{self.base_url}/w/api.php", params=params)
+        if response.status_code != 200:
+            return STATUS_MISSING, None
+
+        pages = response.json().get('query', {}).get('pages', {})
+        for page_data in pages.values():
+            extract = page_data.get('extract', '')
+            if extract and len(extract) > 50:
+                return STATUS_OK, (extract[:500] + "..." if len(extract) > 500 else extract)
+
+        return STATUS_MISSING, None
+
+    def _fetch_sequential(self, plant_name):
+        try:
+            result = self._fetch_rest(plant_name)
+        except Exception as e:
+            logging.error("Error fetching Wikipedia summary: %s", e)
+            result = None
+        if result is None:
+            result = self._fetch_query(plant_name)
+        return result
+
+    def _fetch_hedged(self, plant_name):
+        executor = self._get_executor()
+        rest = executor.submit(self._fetch_rest, plant_name)
+        done, _ = wait([rest], timeout=self.hedge_delay)
+        if done and not rest.exception() and rest.result() is not None:
+            return rest.result()
+
+        self._count('hedged')
+        query = executor.submit(self._fetch_query, plant_name)
+        pending = {rest, query}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result() and future.result()[0] == STATUS_OK:
+                    return future.result()
+
+        if rest.exception() is None and rest.result() is not None:
+            return rest.result()
+        if query.exception() is not None:
+            raise query.exception()
+        return query.result()
+
+    def _fetch(self, plant_name):
+        try:
+            if self.hedge_delay is not None:
+                return self._fetch_hedged(plant_name)
+            return self._fetch_sequential(plant_name)
+        except Exception as e:
+            logging.error("Error fetching Wikipedia summary: %s", e)
+            return STATUS_ERROR, None
+
+    def fetch_summary(self, plant_name):
+        """Fetch a (status, text) pair, sharing one fetch between concurrent callers
+
+        Only threads of this process are coalesced; other gunicorn workers
+        asking for the same name at the same time make their own request.
+        """
+        with self._lock:
+            call = self._inflight.get(plant_name)
+            leader = call is None
+            if leader:
+                call = self._inflight[plant_name] = _Call()
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            return call.result
+
+        try:
+            call.result = self._fetch(plant_name)
+        finally:
+            with self._lock:
+                del self._inflight[plant_name]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """Outbound request counters for this process"""
+        with self._lock:
+            return dict(self._counters)
+
+
+wiki_client = WikipediaClient()
@@ -0,0 +1,199 @@
+"""Offline snapshot of Wikipedia summaries, memory-mapped by every worker
+
+Fetch a summary for every catalog species into the snapshot with:
+
+    python wiki_snapshot.py [--output data/wikipedia_snapshot.bin] [--workers 4]
+
+This runs without importing the app, so nothing is warmed up or started.
+"""
+import argparse
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog import catalog
+from wiki_cache import STATUS_MISSING, STATUS_OK, wiki_cache
+from wiki_client import wiki_client
+
+WIKI_SNAPSHOT_PATH = os.environ.get(
+    'WIKI_SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'wikipedia_snapshot.bin'))
+
+# Snapshot entries older than this are still served, and refreshed in the background
+WIKI_SNAPSHOT_MAX_AGE = int(os.environ.get('WIKI_SNAPSHOT_MAX_AGE', 30 * 24 * 3600))
+
+# Seconds before a failed background refresh of the same name is retried
+WIKI_REFRESH_COOLDOWN = int(os.environ.get('WIKI_REFRESH_COOLDOWN', 300))
+
+# File layout, little-endian:
+#   header   magic, version, entry count, index offset
+#   records  status (u8), fetched_at (f64), text length (u32), UTF-8 text
+#   index    per entry: name length (u16), UTF-8 name, record offset (u64)
+MAGIC = b'FLWS'
+VERSION = 1
+HEADER = struct.Struct('<4sIIQ')
+RECORD = struct.Struct('<BdI')
+INDEX_NAME = struct.Struct('<H')
+INDEX_OFFSET = struct.Struct('<Q')
+
+STATUS_CODES = {STATUS_OK: 1, STATUS_MISSING: 2}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+
+class WikiSnapshot:
+    """Read-only, memory-mapped store of prefetched Wikipedia summaries
+
+    Only the name -> offset index is held in Python objects; texts are
+    decoded from the mapping on lookup, and the mapped pages are shared by
+    every worker forked after loading.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} Wikipedia snapshot')
+
+        self._offsets = {}
+        position = index_offset
+        for _ in range(count):
+            (name_length,) = INDEX_NAME.unpack_from(self._map, position)
+            position += INDEX_NAME.size
+            name = self._map[position:position + name_length].decode('utf-8')
+            position += name_length
+            (self._offsets[name],) = INDEX_OFFSET.unpack_from(self._map, position)
+            position += INDEX_OFFSET.size
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, name):
+        return name in self._offsets
+
+    def get(self, name):
+        """Return (status, text, fetched_at) for name, or None if it was never prefetched"""
+        offset = self._offsets.get(name)
+        if offset is None:
+            return None
+        status_code, fetched_at, length = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        text = self._map[start:start + length].decode('utf-8') if length else None
+        return STATUS_NAMES[status_code], text, fetched_at
+
+    def entries(self):
+        """All entries as {name: (status, text, fetched_at)}"""
+        return {name: self.get(name) for name in self._offsets}
+
+
+def write_snapshot(path, entries):
+    """Atomically write {name: (status, text, fetched_at)} entries to a snapshot file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f'{path}.tmp'
+    offsets = {}
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+        for name, (status, text, fetched_at) in sorted(entries.items()):
+            data = (text or '').encode('utf-8')
+            offsets[name] = f.tell()
+            f.write(RECORD.pack(STATUS_CODES[status], fetched_at, len(data)))
+            f.write(data)
+
+        index_offset = f.tell()
+        for name, offset in offsets.items():
+            encoded = name.encode('utf-8')
+            f.write(INDEX_NAME.pack(len(encoded)) + encoded + INDEX_OFFSET.pack(offset))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(offsets), index_offset))
+    os.replace(tmp_path, path)
+
+
+def load_wiki_snapshot(path=WIKI_SNAPSHOT_PATH):
+    """Open the snapshot written by `python wiki_snapshot.py`, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = WikiSnapshot(path)
+    except (OSError, ValueError, struct.error) as e:
+        logging.error("Error loading Wikipedia snapshot: %s", e)
+        return None
+    logging.info("Loaded Wikipedia snapshot with %s entries", len(snapshot))
+    return snapshot
+
+
+def prefetch(names, path=WIKI_SNAPSHOT_PATH, workers=4):
+    """Fetch summaries for names and write them to the snapshot
+
+    Failed fetches keep the entry from the previous snapshot, if any.
+    Returns the counts of stored, missing and failed names.
+    """
+    previous = load_wiki_snapshot(path)
+    entries = previous.entries() if previous is not None else {}
+    counts = dict.fromkeys(('ok', 'missing', 'failed'), 0)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, (status, text) in zip(names, executor.map(wiki_client.fetch_summary, names)):
+            if status in STATUS_CODES:
+                entries[name] = (status, text, time.time())
+                counts['ok' if status == STATUS_OK else 'missing'] += 1
+            else:
+                counts['failed'] += 1
+
+    write_snapshot(path, entries)
+    return counts
+
+
+class SnapshotRefresher:
+    """Refresh stale snapshot entries into wiki_cache on a background thread"""
+
+    def __init__(self, cooldown=WIKI_REFRESH_COOLDOWN):
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._attempts = {}
+        self._executor = None
+        self._pid = None
+
+    def refresh(self, name):
+        """Schedule a refresh of name unless one ran or is running within the cooldown"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._attempts.get(name, -self.cooldown) < self.cooldown:
+                return
+            self._attempts[name] = now
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='wiki-refresh')
+                self._pid = os.getpid()
+            self._executor.submit(self._refresh, name)
+
+    def _refresh(self, name):
+        status, text = wiki_client.fetch_summary(name)
+        # Keep serving the snapshot text rather than caching a failed fetch over it
+        if status in STATUS_CODES:
+            wiki_cache.put(name, status, text)
+
+
+snapshot_refresher = SnapshotRefresher()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default=WIKI_SNAPSHOT_PATH, help='snapshot file to write')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent Wikipedia requests')
+    args = parser.parse_args()
+
+    names = list(catalog.species_by_name)
+    counts = prefetch(names, args.output, args.workers)
+    print(f"Fetched {len(names)} species: {counts['ok']} found, {counts['missing']} missing, "
+          f"{counts['failed']} failed; wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()